@@ -0,0 +1,246 @@
+import hashlib
+from dataclasses import dataclass, field, replace
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from billing import CENTS_PER_DOLLAR, MONEY_COLUMNS
+
+# Dimensiones y medidas del cubo de agregados
+CUBE_KEYS = ['month', 'plan_name', 'city']
+CUBE_MEASURES = [
+    'total_minutes', 'messages_count', 'usage_mb',
+    'extra_minute_cost', 'extra_message_cost', 'extra_mb_cost',
+    'usd_monthly_pay', 'total_monthly_cost',
+]
+OVERAGE_COLUMNS = ['extra_minutes', 'extra_messages', 'extra_mb']
+
+# Las medidas de dinero vienen en centavos y sus sumas se guardan en int64: el total
+# no depende del orden ni de cómo se partan los datos
+MONEY_MEASURES = [c for c in CUBE_MEASURES if c in MONEY_COLUMNS]
+
+# Bordes fijos del histograma de ingresos (USD); al ser fijos, los histogramas se suman
+COST_BIN_EDGES = np.arange(0, 505, 5, dtype=float)
+
+
+def fingerprint(frame):
+    """Huella estable del contenido de un DataFrame."""
+    hashes = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+    return hashlib.sha1(hashes.tobytes()).hexdigest()[:16]
+
+
+def _cube_delta(rows, weights=None):
+    # Sumas, sumas de cuadrados y conteo de excedentes por (month, plan_name, city). Con
+    # ``weights`` (factor de expansión de una muestra) cada fila cuenta ``weight`` veces
+    # y las sumas de dinero quedan como estimaciones en float
+    values = rows[CUBE_MEASURES].astype(float)
+    if weights is None:
+        weight = 1
+        sums = rows[CUBE_MEASURES].astype({c: np.int64 if c in MONEY_MEASURES else float for c in CUBE_MEASURES})
+    else:
+        weight = np.asarray(weights, dtype=float)
+        sums = values
+    delta = pd.concat([
+        rows[CUBE_KEYS],
+        sums.mul(weight, axis=0).add_suffix('_sum'),
+        (values ** 2).mul(weight, axis=0).add_suffix('_sumsq'),
+        (rows[OVERAGE_COLUMNS] > 0).astype(np.int64).mul(weight, axis=0).add_suffix('_count'),
+    ], axis=1)
+    delta['rows'] = weight
+    return delta.groupby(CUBE_KEYS, observed=True).sum()
+
+
+def _histogram_delta(rows, weights=None):
+    # Conteos (ponderados si hay ``weights``) por (month, plan_name) en los bins fijos de
+    # ingreso; el último bin absorbe el resto
+    n_bins = len(COST_BIN_EDGES) - 1
+    edges = COST_BIN_EDGES * CENTS_PER_DOLLAR
+    bins = np.clip(np.searchsorted(edges, rows['total_monthly_cost'].to_numpy(), side='right') - 1,
+                   0, n_bins - 1)
+    counts = pd.DataFrame({
+        'month': rows['month'], 'plan_name': rows['plan_name'], 'bin': bins,
+        'weight': 1 if weights is None else np.asarray(weights, dtype=float),
+    })
+    return (
+        counts.groupby(['month', 'plan_name', 'bin'])['weight'].sum()
+        .unstack('bin', fill_value=0)
+        .reindex(columns=range(n_bins), fill_value=0)
+    )
+
+
+def _add(left, right, sign=1):
+    if left is None:
+        return right * sign
+    # La alineación pasa por NaN y convierte a float; se restauran los tipos (sumas int64)
+    dtypes = right.dtypes.to_dict() if isinstance(right, pd.DataFrame) else right.dtype
+    return left.add(right * sign, fill_value=0).astype(dtypes)
+
+
+@dataclass(frozen=True)
+class AggregateState:
+    """Agregados del tablero que se actualizan sumando deltas mes a mes.
+
+    Con ``user_weights`` el estado representa una muestra: cada fila del
+    usuario pesa su factor de expansión en el cubo y los histogramas, así que
+    sumas y medias son estimaciones de la población.
+    """
+
+    partitions: dict = field(default_factory=dict)       # mes -> filas usuario-mes
+    month_versions: dict = field(default_factory=dict)   # mes -> huella de la partición
+    month_cubes: dict = field(default_factory=dict)      # mes -> delta del cubo
+    month_histograms: dict = field(default_factory=dict) # mes -> delta del histograma
+    cube: pd.DataFrame = None
+    cost_histogram: pd.DataFrame = None
+    user_churn: pd.Series = None                          # user_id -> mes de abandono
+    churn_by_month: pd.Series = None                      # mes -> usuarios que abandonan
+    user_weights: pd.Series = None                        # user_id -> factor de expansión (muestras)
+
+    @property
+    def months(self):
+        return sorted(self.partitions)
+
+    @property
+    def summary(self):
+        """Tabla usuario-mes completa (concatena las particiones)."""
+        if not self.partitions:
+            return pd.DataFrame()
+        return pd.concat([self.partitions[m] for m in self.months], ignore_index=True)
+
+    def version_for(self, months=None):
+        """Huella de los meses indicados (todos por defecto) y de la tabla de usuarios."""
+        months = self.months if months is None else sorted(months)
+        parts = [f"{m}:{self.month_versions.get(m, '')}" for m in months]
+        parts.append(f"users:{self.users_version}")
+        return hashlib.sha1('|'.join(parts).encode()).hexdigest()[:16]
+
+    # Las huellas se calculan una vez por estado: el estado es inmutable y cada
+    # actualización (``replace``) crea uno nuevo sin estos valores en caché
+    @cached_property
+    def users_version(self):
+        return '' if self.user_churn is None else fingerprint(self.user_churn.reset_index())
+
+    @cached_property
+    def version(self):
+        return self.version_for()
+
+
+def _churn_counts(churn_months):
+    return churn_months.dropna().value_counts()
+
+
+def update_users(state, users_delta):
+    """Aplica usuarios nuevos o con cambios (``user_id``, ``churn_date``) a las estadísticas de abandono."""
+    delta = users_delta.set_index('user_id')['churn_date'].dt.to_period('M')
+    user_churn = state.user_churn if state.user_churn is not None else pd.Series(dtype='period[M]')
+
+    # Restar el abandono previo de los usuarios modificados y sumar el nuevo
+    previous = user_churn.reindex(delta.index[delta.index.isin(user_churn.index)])
+    churn_by_month = _add(state.churn_by_month, _churn_counts(previous), sign=-1) if len(previous) else state.churn_by_month
+    churn_by_month = _add(churn_by_month, _churn_counts(delta))
+    churn_by_month = churn_by_month[churn_by_month != 0].astype(np.int64)
+
+    user_churn = pd.concat([user_churn.drop(delta.index, errors='ignore'), delta])
+    return replace(state, user_churn=user_churn, churn_by_month=churn_by_month)
+
+
+def refresh_month(state, month_rows, users_delta=None):
+    """Incorpora (o reemplaza) las filas usuario-mes de un solo mes.
+
+    El costo es proporcional a las filas del mes: se calcula el delta del cubo
+    y del histograma de ese mes y se suma a los agregados existentes. Si el mes
+    ya existía, primero se resta su delta anterior. Los meses no afectados
+    conservan su huella, por lo que sus entradas de caché siguen siendo válidas.
+    """
+    months = month_rows['month'].unique()
+    if len(months) != 1:
+        raise ValueError("refresh_month espera filas de un único mes")
+    month = months[0]
+
+    if users_delta is not None:
+        state = update_users(state, users_delta)
+
+    cube, histogram = state.cube, state.cost_histogram
+    if month in state.partitions:
+        cube = _add(cube, state.month_cubes[month], sign=-1)
+        histogram = _add(histogram, state.month_histograms[month], sign=-1)
+
+    weights = None if state.user_weights is None else month_rows['user_id'].map(state.user_weights).to_numpy()
+    cube_delta = _cube_delta(month_rows, weights)
+    histogram_delta = _histogram_delta(month_rows, weights)
+    cube = _add(cube, cube_delta)
+    histogram = _add(histogram, histogram_delta)
+
+    return replace(
+        state,
+        partitions={**state.partitions, month: month_rows.reset_index(drop=True)},
+        month_versions={**state.month_versions, month: fingerprint(month_rows)},
+        month_cubes={**state.month_cubes, month: cube_delta},
+        month_histograms={**state.month_histograms, month: histogram_delta},
+        cube=cube[cube['rows'] > 0],
+        cost_histogram=histogram,
+    )
+
+
+def build_state(users, summary_with_plans, user_weights=None):
+    """Construye el estado aplicando ``refresh_month`` mes por mes.
+
+    ``user_weights`` (``user_id`` -> factor de expansión) pondera las filas de
+    una muestra; ver ``sampling.stratum_weights``.
+    """
+    state = update_users(AggregateState(user_weights=user_weights), users[['user_id', 'churn_date']])
+    for _, month_rows in summary_with_plans.groupby('month', sort=True):
+        state = refresh_month(state, month_rows)
+    return state
+
+
+def _cube_for(state, months):
+    if months is None:
+        return state.cube
+    return state.cube[state.cube.index.get_level_values('month').isin(list(months))]
+
+
+def monthly_stat(state, column, stat='mean', by=('month', 'plan_name'), months=None):
+    """Media, suma o varianza de ``column`` agrupada por ``by`` a partir del cubo.
+
+    Las columnas de dinero se suman en centavos (int64) y el resultado se
+    devuelve en dólares.
+    """
+    grouped = _cube_for(state, months).groupby(level=list(by), observed=True)[[f'{column}_sum', f'{column}_sumsq', 'rows']].sum()
+    n, total, total_sq = grouped['rows'], grouped[f'{column}_sum'], grouped[f'{column}_sumsq']
+    if stat == 'sum':
+        result = total
+    elif stat == 'mean':
+        result = total / n
+    elif stat == 'var':
+        result = (total_sq - total ** 2 / n) / (n - 1)
+    else:
+        raise ValueError(f"Estadístico no soportado: {stat}")
+    if column in MONEY_MEASURES:
+        result = result / CENTS_PER_DOLLAR ** (2 if stat == 'var' else 1)
+    return result.rename(column).reset_index()
+
+
+def kpis(state, months=None):
+    """KPIs del resumen calculados sólo con el cubo y las estadísticas de abandono."""
+    cube = _cube_for(state, months)
+    totals = cube[['total_monthly_cost_sum', 'rows']].sum()
+    income = totals['total_monthly_cost_sum'] / CENTS_PER_DOLLAR
+    n_users = len(state.user_churn)
+    n_churned = int(state.churn_by_month.sum()) if state.churn_by_month is not None else 0
+    return {
+        'total_users': n_users,
+        'churn_rate': n_churned / n_users * 100 if n_users else 0.0,
+        'avg_monthly_income': income / totals['rows'],
+        'avg_total_monthly_income': income / cube.index.get_level_values('month').nunique(),
+    }
+
+
+def approximate_cost_quantiles(state, quantiles, plan_name=None):
+    """Cuantiles aproximados de ``total_monthly_cost`` a partir de los histogramas sumados."""
+    histogram = state.cost_histogram
+    if plan_name is not None:
+        histogram = histogram.xs(plan_name, level='plan_name')
+    counts = histogram.sum().to_numpy(dtype=float)
+    cumulative = np.concatenate([[0], np.cumsum(counts)]) / counts.sum()
+    return np.interp(quantiles, cumulative, COST_BIN_EDGES)
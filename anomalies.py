@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+# Métricas de uso vigiladas
+ANOMALY_METRICS = ['total_minutes', 'messages_count', 'usage_mb']
+
+# Piso de la dispersión: evita z-scores enormes cuando el historial es casi constante
+MIN_RELATIVE_SPREAD = 0.25
+MIN_ABSOLUTE_SPREAD = 1.0
+
+
+def _sorted_panel(summary_with_plans):
+    # Ordena por (user_id, month) sólo si hace falta; la tabla del índice de suscriptores ya viene ordenada
+    user_ids = summary_with_plans['user_id'].to_numpy(dtype=np.int64)
+    months = summary_with_plans['month'].array.asi8
+    is_sorted = len(user_ids) < 2 or bool(np.all(
+        (user_ids[1:] > user_ids[:-1]) | ((user_ids[1:] == user_ids[:-1]) & (months[1:] > months[:-1]))
+    ))
+    if is_sorted:
+        return summary_with_plans
+    return summary_with_plans.iloc[np.lexsort((months, user_ids))]
+
+
+# Línea base EWMA: peso del mes más reciente y recorte (en dispersiones) de lo que
+# entra a la línea base, para que un pico no infle la base de los meses siguientes
+EWMA_ALPHA = 0.3
+BASELINE_CLIP_Z = 3.0
+
+
+def _spread_floor(baseline):
+    return np.maximum(MIN_RELATIVE_SPREAD * np.abs(baseline), MIN_ABSOLUTE_SPREAD)
+
+
+def _ewma_baselines(values, history):
+    # Media y varianza EWMA de los meses anteriores de cada usuario. Se avanza por
+    # posición dentro del historial (1, 2, …): cada paso actualiza a la vez a todos
+    # los usuarios con ese mes previo, así que el costo es lineal en filas y no hay
+    # bucles por usuario. Cada fila toma el estado de la fila anterior (mismo usuario)
+    baseline = np.full(len(values), np.nan)
+    variance = np.full(len(values), np.nan)
+    order = np.argsort(history, kind='stable')
+    bounds = np.searchsorted(history[order], np.arange(1, int(history.max(initial=0)) + 2))
+    for position, (lo, hi) in enumerate(zip(bounds[:-1], bounds[1:]), start=1):
+        rows = order[lo:hi]
+        prev = rows - 1
+        if position == 1:
+            baseline[rows] = values[prev]
+            variance[rows] = 0.0
+            continue
+        spread = np.fmax(np.sqrt(variance[prev]), _spread_floor(baseline[prev]))
+        clipped = np.clip(values[prev], baseline[prev] - BASELINE_CLIP_Z * spread,
+                          baseline[prev] + BASELINE_CLIP_Z * spread)
+        delta = clipped - baseline[prev]
+        baseline[rows] = baseline[prev] + EWMA_ALPHA * delta
+        variance[rows] = (1 - EWMA_ALPHA) * (variance[prev] + EWMA_ALPHA * delta ** 2)
+    return baseline, variance
+
+
+def score_usage(summary_with_plans, metrics=ANOMALY_METRICS):
+    """Puntaje de anomalía de cada fila usuario-mes respecto al historial previo del usuario.
+
+    La línea base es una media móvil exponencial (EWMA) de los meses anteriores
+    del mismo usuario y la dispersión su desviación EWMA, con un piso relativo
+    y absoluto (con un solo mes previo sólo cuenta el piso). Lo que entra a la
+    línea base se recorta a ``BASELINE_CLIP_Z`` dispersiones, así que un pico
+    no esconde los siguientes. Se calcula sobre el panel ordenado avanzando
+    por posición en el historial, sin bucles por usuario. Devuelve una fila
+    por (usuario, mes, métrica).
+    """
+    panel = _sorted_panel(summary_with_plans)
+    user_ids = panel['user_id'].to_numpy(dtype=np.int64)
+    n = len(user_ids)
+
+    new_user = np.r_[True, user_ids[1:] != user_ids[:-1]] if n else np.zeros(0, dtype=bool)
+    segment_starts = np.flatnonzero(new_user)
+    segment_of_row = np.cumsum(new_user) - 1
+    history = np.arange(n) - segment_starts[segment_of_row]  # meses previos del usuario
+
+    # Columnas de identificación comunes; se repiten por métrica sin convertir a objetos Python
+    keys = panel[['user_id', 'month', 'plan_name']].reset_index(drop=True)
+
+    frames = []
+    for metric in metrics:
+        values = panel[metric].to_numpy(dtype=float)
+        baseline, variance = _ewma_baselines(values, history)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            spread = np.fmax(np.sqrt(variance), _spread_floor(baseline))
+            z_score = (values - baseline) / spread
+            ratio = values / baseline
+
+        frames.append(keys.assign(
+            metric=metric,
+            value=values,
+            baseline=baseline,
+            ratio=ratio,
+            z_score=z_score,
+            history_months=history,
+        ))
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def rank_anomalies(scores, z_threshold=4.0, min_history=3, top=None):
+    """Filas con ``z_score`` por encima del umbral y suficiente historial, de mayor a menor."""
+    flagged = scores[(scores['history_months'] >= min_history) & (scores['z_score'] >= z_threshold)]
+    flagged = flagged.sort_values('z_score', ascending=False, kind='stable')
+    return flagged if top is None else flagged.head(top)
@@ -0,0 +1,189 @@
+import argparse
+import hashlib
+import json
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+import datasets
+from aggregates import kpis, monthly_stat
+from billing import cost_under_plans
+from hypothesis import plan_revenue_groups, region_revenue_groups, welch_test
+
+
+def _to_builtin(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (pd.Period, pd.Timestamp)):
+        return str(value)
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+
+def _records(frame):
+    return frame.to_dict(orient='records')
+
+
+def _months_param(query, state):
+    # ?start=YYYY-MM&end=YYYY-MM limita los meses de los agregados
+    start = query.get('start', [None])[0]
+    end = query.get('end', [None])[0]
+    if start is None and end is None:
+        return None
+    start = pd.Period(start, freq='M') if start else state.months[0]
+    end = pd.Period(end, freq='M') if end else state.months[-1]
+    months = [m for m in state.months if start <= m <= end]
+    if not months:
+        raise ValueError(f"El rango {start}..{end} no contiene meses con datos")
+    return months
+
+
+def _kpis(query):
+    state = datasets.load_state()
+    return kpis(state, _months_param(query, state))
+
+
+def _revenue_by_plan(query):
+    state = datasets.load_state()
+    months = _months_param(query, state)
+    columns = {
+        'total_monthly_cost': 'avg_income',
+        'usd_monthly_pay': 'base_fee',
+        'extra_minute_cost': 'extra_minutes',
+        'extra_message_cost': 'extra_messages',
+        'extra_mb_cost': 'extra_data',
+    }
+    breakdown = None
+    for column, name in columns.items():
+        stat = monthly_stat(state, column, by=('plan_name',), months=months).rename(columns={column: name})
+        breakdown = stat if breakdown is None else breakdown.merge(stat, on='plan_name')
+    totals = monthly_stat(state, 'total_monthly_cost', stat='sum', by=('plan_name',), months=months)
+    breakdown = breakdown.merge(totals.rename(columns={'total_monthly_cost': 'total_income'}), on='plan_name')
+    return _records(breakdown)
+
+
+def _revenue_by_month(query):
+    state = datasets.load_state()
+    monthly = monthly_stat(state, 'total_monthly_cost', stat='sum', months=_months_param(query, state))
+    return _records(monthly.rename(columns={'total_monthly_cost': 'total_income'}))
+
+
+def _tests(query):
+    alpha = float(query.get('alpha', ['0.05'])[0])
+    summary_with_plans = datasets.load_summary()
+    return {
+        'plan': welch_test(*plan_revenue_groups(summary_with_plans), alpha),
+        'region': welch_test(*region_revenue_groups(summary_with_plans), alpha),
+    }
+
+
+def _plans(query):
+    _, plans, _ = datasets.load_data()
+    return _records(plans)
+
+
+def _plan_cost(query):
+    # ?minutes=&messages=&gb= : costo del mismo consumo en cada plan
+    _, plans, _ = datasets.load_data()
+    usage = pd.DataFrame({
+        'total_minutes': [float(query.get('minutes', ['0'])[0])],
+        'messages_count': [float(query.get('messages', ['0'])[0])],
+        'usage_mb': [float(query.get('gb', ['0'])[0]) * 1024],
+    })
+    costs = cost_under_plans(usage, plans).iloc[0]
+    return {'costs': costs.to_dict(), 'cheapest_plan': costs.idxmin()}
+
+
+ROUTES = {
+    '/api/kpis': _kpis,
+    '/api/revenue/by-plan': _revenue_by_plan,
+    '/api/revenue/by-month': _revenue_by_month,
+    '/api/tests': _tests,
+    '/api/plans': _plans,
+    '/api/plan-cost': _plan_cost,
+}
+
+
+@lru_cache(maxsize=4096)
+def render(path, query_string, version):
+    """Cuerpo JSON y ETag de una ruta; se calcula una vez por (ruta, consulta, versión)."""
+    query = parse_qs(query_string)
+    payload = {'version': version, 'data': ROUTES[path](query)}
+    # Sin NaN ni infinitos: no son JSON válido, así que fallan en lugar de emitirse
+    body = json.dumps(payload, default=_to_builtin, ensure_ascii=False, allow_nan=False).encode('utf-8')
+    etag = '"' + hashlib.sha1(f'{version}|{path}?{query_string}'.encode()).hexdigest()[:20] + '"'
+    return body, etag
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 mantiene la conexión abierta entre solicitudes (keep-alive). Con la
+    # escritura en búfer, encabezados y cuerpo salen en un solo envío al terminar
+    # cada solicitud y no esperan el ACK retardado del cliente
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    wbufsize = -1
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == '/api/version':
+            self._send_json(200, json.dumps({'version': datasets.load_state().version}).encode())
+            return
+        if url.path not in ROUTES:
+            self._send_json(404, json.dumps({'error': f'Ruta no encontrada: {url.path}'}).encode())
+            return
+
+        try:
+            body, etag = render(url.path, url.query, datasets.load_state().version)
+        except (ValueError, KeyError) as e:
+            self._send_json(400, json.dumps({'error': str(e)}, ensure_ascii=False).encode('utf-8'))
+            return
+
+        if etag in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self._send_json(200, body, etag)
+
+    def _send_json(self, status, body, etag=None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-cache')
+        if etag is not None:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Sin registro por solicitud para no penalizar el rendimiento
+        pass
+
+
+def make_server(host='127.0.0.1', port=8502):
+    # Calentar la capa de datos antes de aceptar conexiones
+    datasets.load_state()
+    return ThreadingHTTPServer((host, port), ApiHandler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API JSON local con los agregados del dashboard Megaline")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8502)
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port)
+    print(f"API de Megaline escuchando en http://{args.host}:{args.port}/api/kpis")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,32 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-from scipy import stats
 import plotly.express as px
 import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+
+from aggregates import build_state, kpis, monthly_stat
+from anomalies import rank_anomalies, score_usage
+import datasets
+from billing import MONEY_COLUMNS, cost_under_plans, monthly_bill, plan_parameters, to_dollars
+from daily import crossing_day_distribution, limit_crossings
+from nowcast import nowcast_bills, rank_at_risk
+from breakeven import USAGE_DIMENSIONS, break_even_points, cost_curves, usage_distribution
+from forecasting import forecast_revenue
+from hypothesis import plan_revenue_groups, region_revenue_groups, welch_test
+from power import power_curves, required_sample_sizes, simulate_experiments
+from shared_data import freeze
+from storage import STORE_DIR, read_partitioned, sync_month_partitions
+from subscribers import build_subscriber_index
+from segmentation import segment_users, user_usage_profiles
+from sampling import (
+    sample_summary,
+    stratified_mean_ci,
+    stratified_monthly_total_ci,
+    stratified_proportion_ci,
+    stratified_reservoir_sample,
+    stratum_weights,
+)
 
 # Configuración de la página
 st.set_page_config(
@@ -58,121 +78,152 @@ comparando el comportamiento y rentabilidad de sus dos planes principales: "Surf
 """)
 
 #pestañas para organizar el contenido
-tabs = st.tabs(["📊 Resumen", "📞 Llamadas", "💬 Mensajes", "🌐 Internet", "💰 Ingresos", "🧪 Pruebas Estadísticas", "📝 Conclusiones"])
+tabs = st.tabs(["📊 Resumen", "📞 Llamadas", "💬 Mensajes", "🌐 Internet", "💰 Ingresos", "🧪 Pruebas Estadísticas", "📝 Conclusiones", "🔎 Suscriptores", "🚨 Anomalías", "🧩 Segmentos", "📅 Uso Diario"])
 
 # Función para cargar datos
-@st.cache_data
+# Los datos se comparten entre sesiones como un recurso de sólo lectura (sin copia por sesión)
+@st.cache_resource
 def load_data():
     try:
-        # Para demostración, generamos datos sintéticos similares a los del notebook
-        
-        # Planes
-        plans = pd.DataFrame({
-            'plan_name': ['surf', 'ultimate'],
-            'usd_monthly_pay': [20, 70],
-            'minutes_included': [500, 3000],
-            'messages_included': [50, 1000],
-            'mb_per_month_included': [15360, 30720],  # 15GB y 30GB en MB
-            'usd_per_minute': [0.03, 0.01],
-            'usd_per_message': [0.03, 0.01],
-            'usd_per_gb': [10, 7]
-        })
-        
-        # Generar datos sintéticos para usuarios
-        np.random.seed(42)
-        n_users = 500
-        user_ids = range(1, n_users + 1)
-        plans_list = ['surf', 'ultimate']
-        cities = ['New York', 'Chicago', 'Boston', 'Los Angeles', 'Miami', 'Jersey City', 'San Francisco']
-        
-        users = pd.DataFrame({
-            'user_id': user_ids,
-            'plan': np.random.choice(plans_list, n_users, p=[0.6, 0.4]),  # 60% surf, 40% ultimate
-            'city': np.random.choice(cities, n_users),
-            'churn_date': [pd.NaT if np.random.random() > 0.2 else 
-                          pd.Timestamp('2019-01-01') + pd.Timedelta(days=np.random.randint(0, 180)) 
-                          for _ in range(n_users)]
-        })
-        
-        # Generar datos sintéticos para comportamiento de usuario
-        months = pd.period_range(start='2019-01', end='2019-06', freq='M')
-        
-        # Crear dataframe de resumen
-        data_rows = []
-        for user_id in user_ids:
-            user_plan = users.loc[users['user_id'] == user_id, 'plan'].values[0]
-            user_city = users.loc[users['user_id'] == user_id, 'city'].values[0]
-            user_churn = users.loc[users['user_id'] == user_id, 'churn_date'].values[0]
-            
-            plan_data = plans[plans['plan_name'] == user_plan].iloc[0]
-            
-            for month in months:
-                # Verificar si el usuario ya abandonó el servicio
-                if pd.notna(user_churn) and pd.Timestamp(month.start_time) > user_churn:
-                    continue
-                    
-                # Generar datos sintéticos basados en el plan
-                if user_plan == 'surf':
-                    total_minutes = np.random.normal(450, 100)  # Media cercana al límite del plan
-                    messages_count = np.random.normal(40, 15)
-                    usage_mb = np.random.normal(13000, 4000)
-                else:  # ultimate
-                    total_minutes = np.random.normal(1500, 500)
-                    messages_count = np.random.normal(400, 200)
-                    usage_mb = np.random.normal(25000, 7000)
-                
-                # Asegurar valores no negativos
-                total_minutes = max(0, total_minutes)
-                messages_count = max(0, messages_count)
-                usage_mb = max(0, usage_mb)
-                
-                # Calcular costos extras
-                extra_minutes = max(0, total_minutes - plan_data['minutes_included'])
-                extra_messages = max(0, messages_count - plan_data['messages_included'])
-                extra_mb = max(0, usage_mb - plan_data['mb_per_month_included'])
-                
-                extra_minute_cost = extra_minutes * plan_data['usd_per_minute']
-                extra_message_cost = extra_messages * plan_data['usd_per_message']
-                extra_mb_cost = (extra_mb / 1024) * plan_data['usd_per_gb']
-                
-                total_monthly_cost = (
-                    plan_data['usd_monthly_pay'] +
-                    extra_minute_cost +
-                    extra_message_cost +
-                    extra_mb_cost
-                )
-                
-                data_rows.append({
-                    'user_id': user_id,
-                    'month': month,
-                    'plan_name': user_plan,
-                    'city': user_city,
-                    'total_minutes': total_minutes,
-                    'messages_count': messages_count,
-                    'usage_mb': usage_mb,
-                    'extra_minutes': extra_minutes,
-                    'extra_messages': extra_messages,
-                    'extra_mb': extra_mb,
-                    'extra_minute_cost': extra_minute_cost,
-                    'extra_message_cost': extra_message_cost,
-                    'extra_mb_cost': extra_mb_cost,
-                    'total_monthly_cost': total_monthly_cost,
-                    'usd_monthly_pay': plan_data['usd_monthly_pay'],
-                    'minutes_included': plan_data['minutes_included'],
-                    'messages_included': plan_data['messages_included'],
-                    'mb_per_month_included': plan_data['mb_per_month_included'],
-                })
-        
-        summary_with_plans = pd.DataFrame(data_rows)
-        
-        return users, plans, summary_with_plans
+        return datasets.load_data()
         
     except Exception as e:
         st.error(f"Error al cargar los datos: {e}")
         return None, None, None
 
-# Cargar los datos
-users, plans, summary_with_plans = load_data()
+# Las cachés derivadas llevan en la clave la versión de los meses que usan
+# (``state.version_for``): al incorporar un mes con datasets.append_month sólo se
+# invalidan las entradas que dependen de ese mes; las que usan toda la historia
+# reciben ``state.version`` (todos los meses)
+
+# Muestra estratificada por plan y ciudad para exploración rápida
+@st.cache_resource(max_entries=8)
+def load_sample(dataset_version, per_stratum, seed=42):
+    users, _, _ = load_data()
+    sample_users, stratum_sizes = stratified_reservoir_sample(users, per_stratum, seed=seed)
+    return freeze((sample_users, sample_summary(datasets.load_summary(), sample_users), stratum_sizes))
+
+# Agregados mensuales (cubo, histogramas y abandono) construidos mes a mes. El estado
+# completo lo mantiene la capa de datos: un mes nuevo se incorpora con
+# datasets.append_month (aggregates.refresh_month) sin recalcular la historia
+def load_state(per_stratum=None):
+    if per_stratum is None:
+        return datasets.load_state()
+    return load_sample_state(datasets.load_state().version, per_stratum)
+
+# En modo muestreado cada fila pesa N/n de su estrato, así que sumas y medias estiman la población
+@st.cache_resource(max_entries=8)
+def load_sample_state(dataset_version, per_stratum):
+    users, summary_with_plans, stratum_sizes = load_sample(dataset_version, per_stratum)
+    return freeze(build_state(users, summary_with_plans, stratum_weights(users, stratum_sizes)))
+
+# Tabla de hechos particionada por mes en disco; al cambiar la versión sólo se
+# reescriben los meses cuya huella cambió
+@st.cache_resource(max_entries=1)
+def load_store(dataset_version):
+    state = load_state()
+    sync_month_partitions(state.partitions, state.month_versions, STORE_DIR)
+    return str(STORE_DIR)
+
+# Lectura de un rango de meses: sólo se abren las particiones de ese rango (las
+# vistas filtradas usan todas las columnas; ``month`` sale del directorio)
+@st.cache_resource(max_entries=16)
+def load_month_range(start, end, range_version):
+    store = load_store(load_state().version)
+    return freeze(read_partitioned(store, start=start, end=end))
+
+# Índice por suscriptor sobre la tabla ordenada por usuario (búsqueda en tiempo constante)
+@st.cache_resource(max_entries=1)
+def load_subscriber_index(dataset_version):
+    users, _, _ = load_data()
+    return freeze((build_subscriber_index(datasets.load_summary()), users.set_index('user_id')))
+
+# Puntajes de anomalía sobre el panel ya ordenado por usuario
+@st.cache_resource(max_entries=1)
+def load_anomaly_scores(dataset_version):
+    subscriber_index, _ = load_subscriber_index(dataset_version)
+    return freeze(score_usage(subscriber_index.table))
+
+# Segmentación de suscriptores; la versión del conjunto de datos forma parte de la clave de caché
+@st.cache_resource
+def load_segments(dataset_version, n_segments):
+    subscriber_index, _ = load_subscriber_index(dataset_version)
+    return freeze(segment_users(user_usage_profiles(subscriber_index), k=n_segments))
+
+# Pronósticos de ingreso por (plan, ciudad), ajustados en lote y en caché por versión del conjunto de datos
+@st.cache_resource
+def load_forecasts(dataset_version, horizon):
+    return freeze(forecast_revenue(load_state(), horizon=horizon))
+
+# Parámetros de cada plan como números de Python para el simulador
+@st.cache_resource
+def load_plan_parameters():
+    _, plans, _ = load_data()
+    return plan_parameters(plans)
+
+# Distribución de usuarios-mes sobre el rango de cada slider del simulador
+@st.cache_resource
+def load_usage_distribution(dataset_version, dimension):
+    return freeze(usage_distribution(datasets.load_summary(), dimension))
+
+# Día del mes en que cada usuario cruza cada límite, a partir del uso diario acumulado
+@st.cache_resource(max_entries=1)
+def load_limit_crossings(dataset_version):
+    return freeze(limit_crossings(datasets.load_daily_usage(), datasets.load_summary()))
+
+# Proyección a fin de mes del último mes disponible con el uso diario hasta el día de corte
+@st.cache_resource
+def load_nowcast(dataset_version, as_of):
+    users, plans, _ = load_data()
+    return freeze(nowcast_bills(
+        datasets.load_daily_usage(), datasets.load_summary(), users, plans, as_of, datasets.load_plan_history()
+    ))
+
+# Experimentos simulados por plan y meses de observación; la potencia para cada
+# efecto y α se calcula después sobre este resultado sin volver a simular
+@st.cache_resource
+def load_power_simulation(dataset_version, plan_name, months):
+    return freeze(simulate_experiments(datasets.load_summary(), plan_name, months=months))
+
+# Cargar los datos (la tabla usuario-mes incluye los meses incorporados con append_month)
+users, plans, _ = load_data()
+summary_with_plans = datasets.load_summary()
+total_population = len(users)
+
+# Selector de modo de datos (ambos modos quedan en caché, alternar no recalcula)
+st.sidebar.markdown("### Modo de Datos")
+sampled_mode = st.sidebar.toggle("Modo muestreado (exploración rápida)", value=False)
+per_stratum = st.sidebar.slider(
+    "Usuarios por estrato (plan × ciudad)", 5, 100, 20,
+    disabled=not sampled_mode
+)
+
+stratum_sizes = None
+state = load_state()
+dataset_version = state.version
+if sampled_mode:
+    users, summary_with_plans, stratum_sizes = load_sample(dataset_version, per_stratum)
+    state = load_state(per_stratum)
+    st.sidebar.info(
+        f"Mostrando {len(users):,} de {total_population:,} usuarios. "
+        "Los KPIs incluyen intervalos de confianza del 95%; los gráficos mensuales "
+        "ponderan cada estrato por su fracción de muestreo (N/n)."
+    )
+
+# Rango de meses en pantalla
+all_months = state.months
+month_start, month_end = st.sidebar.select_slider(
+    "Rango de meses",
+    options=all_months,
+    value=(all_months[0], all_months[-1]),
+    format_func=str
+)
+selected_months = [m for m in all_months if month_start <= m <= month_end]
+if len(selected_months) < len(all_months):
+    if sampled_mode:
+        summary_with_plans = summary_with_plans[summary_with_plans['month'].isin(selected_months)]
+    else:
+        summary_with_plans = load_month_range(str(month_start), str(month_end), state.version_for(selected_months))
 
 # Pestaña de Resumen
 with tabs[0]:
@@ -182,7 +233,11 @@ with tabs[0]:
     
     with col1:
         st.markdown("<h3 class='subsection-header'>Distribución de Planes</h3>", unsafe_allow_html=True)
-        plan_counts = users['plan'].value_counts()
+        # En modo muestreado los conteos salen de los tamaños de estrato (exactos)
+        plan_counts = (
+            stratum_sizes.groupby(level='plan').sum().sort_values(ascending=False)
+            if sampled_mode else users['plan'].value_counts()
+        )
         fig = px.pie(
             names=plan_counts.index,
             values=plan_counts.values,
@@ -194,7 +249,10 @@ with tabs[0]:
         
     with col2:
         st.markdown("<h3 class='subsection-header'>Distribución Geográfica</h3>", unsafe_allow_html=True)
-        city_counts = users['city'].value_counts().reset_index()
+        city_counts = (
+            stratum_sizes.groupby(level='city').sum().sort_values(ascending=False)
+            if sampled_mode else users['city'].value_counts()
+        ).reset_index()
         city_counts.columns = ['city', 'count']
         fig = px.bar(
             city_counts,
@@ -231,22 +289,51 @@ with tabs[0]:
     
     kpi1, kpi2, kpi3, kpi4 = st.columns(4)
     
+    if sampled_mode:
+        # Estimaciones poblacionales a partir de la muestra estratificada
+        churn_ci = stratified_proportion_ci(users, stratum_sizes, users['churn_date'].notna())
+        income_ci = stratified_mean_ci(summary_with_plans, users, stratum_sizes).iloc[0]
+        total_income_ci = stratified_monthly_total_ci(summary_with_plans, users, stratum_sizes)
+    
     with kpi1:
-        total_users = len(users)
+        total_users = total_population
         st.metric(label="Total de Usuarios", value=f"{total_users:,}")
         
     with kpi2:
-        active_users = users[users['churn_date'].isna()].shape[0]
-        churn_rate = (1 - active_users / total_users) * 100
-        st.metric(label="Tasa de Abandono", value=f"{churn_rate:.1f}%")
+        if sampled_mode:
+            st.metric(
+                label="Tasa de Abandono",
+                value=f"{churn_ci['estimate'] * 100:.1f}%",
+                delta=f"± {churn_ci['half_width'] * 100:.1f} pp (IC 95%)",
+                delta_color="off"
+            )
+        else:
+            churn_rate = kpis(state, selected_months)['churn_rate']
+            st.metric(label="Tasa de Abandono", value=f"{churn_rate:.1f}%")
         
     with kpi3:
-        avg_monthly_income = summary_with_plans['total_monthly_cost'].mean()
-        st.metric(label="Ingreso Mensual Promedio", value=f"${avg_monthly_income:.2f}")
+        if sampled_mode:
+            st.metric(
+                label="Ingreso Mensual Promedio",
+                value=f"${income_ci['estimate']:.2f}",
+                delta=f"± ${income_ci['half_width']:.2f} (IC 95%)",
+                delta_color="off"
+            )
+        else:
+            avg_monthly_income = kpis(state, selected_months)['avg_monthly_income']
+            st.metric(label="Ingreso Mensual Promedio", value=f"${avg_monthly_income:.2f}")
         
     with kpi4:
-        total_monthly_income = summary_with_plans.groupby('month')['total_monthly_cost'].sum().mean()
-        st.metric(label="Ingreso Mensual Total Promedio", value=f"${total_monthly_income:,.2f}")
+        if sampled_mode:
+            st.metric(
+                label="Ingreso Mensual Total Promedio",
+                value=f"${total_income_ci['estimate']:,.2f}",
+                delta=f"± ${total_income_ci['half_width']:,.2f} (IC 95%)",
+                delta_color="off"
+            )
+        else:
+            total_monthly_income = kpis(state, selected_months)['avg_total_monthly_income']
+            st.metric(label="Ingreso Mensual Total Promedio", value=f"${total_monthly_income:,.2f}")
 
 # Pestaña de Llamadas
 with tabs[1]:
@@ -260,10 +347,8 @@ with tabs[1]:
     )
     
     if call_chart_type == "Duración Promedio por Mes":
-        avg_call_duration = (
-            summary_with_plans.groupby(['month', 'plan_name'])
-            .agg(avg_duration=('total_minutes', 'mean'))
-            .reset_index()
+        avg_call_duration = monthly_stat(state, 'total_minutes', months=selected_months).rename(
+            columns={'total_minutes': 'avg_duration'}
         )
         
         fig = px.bar(
@@ -414,10 +499,8 @@ with tabs[2]:
     )
     
     if msg_chart_type == "Promedio por Mes":
-        avg_messages = (
-            summary_with_plans.groupby(['month', 'plan_name'])
-            .agg(avg_messages=('messages_count', 'mean'))
-            .reset_index()
+        avg_messages = monthly_stat(state, 'messages_count', months=selected_months).rename(
+            columns={'messages_count': 'avg_messages'}
         )
         
         fig = px.bar(
@@ -568,10 +651,8 @@ with tabs[3]:
     )
     
     if net_chart_type == "Promedio por Mes":
-        avg_internet = (
-            summary_with_plans.groupby(['month', 'plan_name'])
-            .agg(avg_usage=('usage_mb', 'mean'))
-            .reset_index()
+        avg_internet = monthly_stat(state, 'usage_mb', months=selected_months).rename(
+            columns={'usage_mb': 'avg_usage'}
         )
         
         # Convertir a GB para mejor visualización
@@ -595,9 +676,10 @@ with tabs[3]:
         st.plotly_chart(fig, use_container_width=True)
         
     elif net_chart_type == "Distribución de Uso":
-        # Crear copia con datos en GB
-        data_for_hist = summary_with_plans.copy()
-        data_for_hist['usage_gb'] = data_for_hist['usage_mb'] / 1024
+        # Sólo las columnas necesarias, con datos en GB (sin copiar la tabla completa)
+        data_for_hist = summary_with_plans[['plan_name']].assign(
+            usage_gb=summary_with_plans['usage_mb'] / 1024
+        )
         
         fig = px.histogram(
             data_for_hist,
@@ -664,8 +746,9 @@ with tabs[3]:
         
         # Gráfico de caja
         # Convertir a GB para mejor visualización
-        data_for_box = summary_with_plans.copy()
-        data_for_box['usage_gb'] = data_for_box['usage_mb'] / 1024
+        data_for_box = summary_with_plans[['plan_name']].assign(
+            usage_gb=summary_with_plans['usage_mb'] / 1024
+        )
         
         fig = px.box(
             data_for_box,
@@ -735,21 +818,31 @@ with tabs[4]:
     # Análisis general de ingresos
     col1, col2 = st.columns(2)
     
+    # Los montos se guardan en centavos enteros; se pasan a dólares sólo para mostrarlos
+    monthly_income_usd = to_dollars(summary_with_plans['total_monthly_cost'])
+    
     with col1:
         # Estadísticas de ingresos por plan
-        income_stats = summary_with_plans.groupby('plan_name')['total_monthly_cost'].describe().round(2)
+        income_stats = monthly_income_usd.groupby(summary_with_plans['plan_name']).describe().round(2)
         st.markdown("<h3 class='subsection-header'>Estadísticas de Ingresos por Plan</h3>", unsafe_allow_html=True)
         st.dataframe(income_stats, use_container_width=True)
         
     with col2:
         # Promedio de ingresos por plan
-        avg_income = summary_with_plans.groupby('plan_name')['total_monthly_cost'].mean().reset_index()
+        if sampled_mode:
+            # Media estimada con barras de error del IC 95%
+            avg_income = stratified_mean_ci(
+                summary_with_plans, users, stratum_sizes, by='plan_name'
+            ).rename(columns={'estimate': 'total_monthly_cost'})
+        else:
+            avg_income = monthly_income_usd.groupby(summary_with_plans['plan_name']).mean().reset_index()
         
         fig = px.bar(
             avg_income,
             x='plan_name',
             y='total_monthly_cost',
             color='plan_name',
+            error_y='half_width' if sampled_mode else None,
             title='Ingreso Mensual Promedio por Plan',
             labels={
                 'plan_name': 'Plan',
@@ -764,7 +857,7 @@ with tabs[4]:
     st.markdown("<h3 class='subsection-header'>Distribución de Ingresos por Plan</h3>", unsafe_allow_html=True)
     
     income_fig = px.box(
-        summary_with_plans,
+        summary_with_plans[['plan_name']].assign(total_monthly_cost=monthly_income_usd),
         x='plan_name',
         y='total_monthly_cost',
         color='plan_name',
@@ -782,7 +875,7 @@ with tabs[4]:
     st.markdown("<h3 class='subsection-header'>Evolución de Ingresos a lo Largo del Tiempo</h3>", unsafe_allow_html=True)
     
     # Convertir 'month' a string para gráfico
-    monthly_income = summary_with_plans.groupby(['month', 'plan_name'])['total_monthly_cost'].sum().reset_index()
+    monthly_income = monthly_stat(state, 'total_monthly_cost', stat='sum', months=selected_months)
     monthly_income['month_str'] = monthly_income['month'].astype(str)
     
     fig = px.line(
@@ -794,7 +887,7 @@ with tabs[4]:
         title='Evolución de Ingresos Totales por Plan',
         labels={
             'month_str': 'Mes',
-            'total_monthly_cost': 'Ingreso Total ($)',
+            'total_monthly_cost': 'Ingreso Total Estimado ($)' if sampled_mode else 'Ingreso Total ($)',
             'plan_name': 'Plan'
         },
         color_discrete_map={'surf': '#1E88E5', 'ultimate': '#43A047'}
@@ -802,6 +895,79 @@ with tabs[4]:
     
     st.plotly_chart(fig, use_container_width=True)
     
+    # Pronóstico de ingresos por plan y ciudad
+    st.markdown("<h3 class='subsection-header'>Pronóstico de Ingresos por Plan y Ciudad</h3>", unsafe_allow_html=True)
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        forecast_metric = st.radio("Métrica", ["Ingreso Total", "ARPU"], horizontal=True, key="forecast_metric")
+    with col2:
+        forecast_horizon = st.slider("Meses a pronosticar", 1, 6, 3)
+    
+    forecasts = load_forecasts(dataset_version, forecast_horizon)
+    forecasts = forecasts[forecasts['metric'] == ('revenue' if forecast_metric == "Ingreso Total" else 'arpu')]
+    with col3:
+        forecast_plan = st.selectbox("Plan", sorted(plans['plan_name']), key="forecast_plan")
+    with col4:
+        # Sólo las ciudades con serie pronosticada para el plan elegido
+        forecast_cities = sorted(forecasts.loc[forecasts['plan_name'] == forecast_plan, 'city'].unique())
+        forecast_city = st.selectbox("Ciudad", forecast_cities, key="forecast_city")
+    
+    series = forecasts[(forecasts['plan_name'] == forecast_plan) & (forecasts['city'] == forecast_city)]
+    history = series[series['kind'] == 'histórico']
+    future = series[series['kind'] == 'pronóstico']
+    
+    if history.empty:
+        st.info(f"No hay serie de ingresos para el plan {forecast_plan.capitalize()} en esa ciudad.")
+    else:
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(
+            x=future['month'].astype(str).tolist() + future['month'].astype(str).tolist()[::-1],
+            y=future['upper'].tolist() + future['lower'].tolist()[::-1],
+            fill='toself',
+            fillcolor='rgba(30, 136, 229, 0.2)',
+            line=dict(color='rgba(0, 0, 0, 0)'),
+            name='Intervalo 95%'
+        ))
+        fig.add_trace(go.Scatter(
+            x=history['month'].astype(str),
+            y=history['value'],
+            mode='lines+markers',
+            name='Histórico',
+            line=dict(color='#1E88E5')
+        ))
+        fig.add_trace(go.Scatter(
+            x=[history['month'].astype(str).iloc[-1]] + future['month'].astype(str).tolist(),
+            y=[history['value'].iloc[-1]] + future['value'].tolist(),
+            mode='lines+markers',
+            name='Pronóstico',
+            line=dict(color='#43A047', dash='dash')
+        ))
+        fig.update_layout(
+            title=f'Pronóstico de {forecast_metric} - {forecast_plan.capitalize()} / {forecast_city}',
+            xaxis_title='Mes',
+            yaxis_title=f'{forecast_metric} ($)'
+        )
+        st.plotly_chart(fig, use_container_width=True)
+    
+    # Pronóstico del próximo mes para todas las series
+    next_month = forecasts[forecasts['kind'] == 'pronóstico'].groupby(['plan_name', 'city']).head(1)
+    st.dataframe(
+        next_month[['plan_name', 'city', 'month', 'value', 'lower', 'upper']]
+        .assign(month=next_month['month'].astype(str))
+        .rename(columns={
+            'plan_name': 'Plan',
+            'city': 'Ciudad',
+            'month': 'Mes',
+            'value': f'{forecast_metric} Pronosticado ($)',
+            'lower': 'Límite Inferior ($)',
+            'upper': 'Límite Superior ($)'
+        })
+        .round(2),
+        use_container_width=True,
+        hide_index=True
+    )
+    
     # Desglose de ingresos
     st.markdown("<h3 class='subsection-header'>Desglose de Ingresos por Componente</h3>", unsafe_allow_html=True)
     
@@ -811,7 +977,7 @@ with tabs[4]:
         extra_minutes=('extra_minute_cost', 'mean'),
         extra_messages=('extra_message_cost', 'mean'),
         extra_data=('extra_mb_cost', 'mean')
-    ).reset_index()
+    ).pipe(to_dollars).reset_index()
     
     # Convertir a formato largo para gráfico de barras apiladas
     income_breakdown_long = pd.melt(
@@ -854,7 +1020,9 @@ with tabs[4]:
     
     with col1:
         # Ingreso total promedio por usuario
-        avg_income_per_user = summary_with_plans.groupby(['user_id', 'plan_name'])['total_monthly_cost'].mean().reset_index()
+        avg_income_per_user = monthly_income_usd.groupby(
+            [summary_with_plans['user_id'], summary_with_plans['plan_name']]
+        ).mean().reset_index()
         avg_income_stats = avg_income_per_user.groupby('plan_name')['total_monthly_cost'].describe().round(2)
         
         st.markdown("<h4>Ingreso Mensual Promedio por Usuario</h4>", unsafe_allow_html=True)
@@ -879,6 +1047,68 @@ with tabs[4]:
         
         st.plotly_chart(fig, use_container_width=True)
 
+# Análisis de potencia como fragmento: cambiar el efecto, α o la potencia objetivo
+# sólo recalcula las curvas sobre la simulación en caché
+@st.fragment
+def power_analysis(dataset_version):
+    col1, col2 = st.columns(2)
+    with col1:
+        power_plan = st.selectbox("Plan del experimento", list(plans['plan_name']), format_func=str.capitalize, key="power_plan")
+        power_months = st.slider("Meses observados por suscriptor", 1, 6, 3, key="power_months")
+    with col2:
+        power_effect = st.slider("Diferencia de ingreso a detectar (USD por suscriptor-mes)", 0.5, 20.0, 5.0, 0.5, key="power_effect")
+        power_alpha = st.select_slider("Nivel de significancia (α)", [0.01, 0.05, 0.10], value=0.05, key="power_alpha")
+        target_power = st.select_slider("Potencia objetivo", [0.7, 0.8, 0.9, 0.95], value=0.8, key="target_power")
+    
+    simulation = load_power_simulation(dataset_version, power_plan, power_months)
+    effects = sorted({1.0, 2.0, 5.0, 10.0, float(power_effect)})
+    curves = power_curves(simulation, effects, power_alpha)
+    required = required_sample_sizes(curves, target_power, power_months)
+    
+    fig = go.Figure()
+    for effect, effect_rows in curves.groupby('effect'):
+        selected = effect == power_effect
+        fig.add_trace(go.Scatter(
+            x=effect_rows['sample_size'],
+            y=effect_rows['power'],
+            mode='lines+markers',
+            name=f"${effect:.2f}",
+            line=dict(width=4 if selected else 1.5, dash='solid' if selected else 'dot')
+        ))
+    fig.add_hline(y=target_power, line_dash='dash', line_color='gray')
+    fig.add_hline(y=power_alpha, line_dash='dot', line_color='red')
+    fig.update_layout(
+        title=f"Curvas de potencia (plan {power_plan.capitalize()}, α = {power_alpha})",
+        xaxis_title='Suscriptores por grupo',
+        yaxis_title='Potencia',
+        xaxis_type='log',
+        yaxis_range=[0, 1.02],
+        legend_title='Diferencia'
+    )
+    
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        st.plotly_chart(fig, use_container_width=True)
+    with col2:
+        selected_row = required[required['effect'] == power_effect].iloc[0]
+        if pd.isna(selected_row['sample_size']):
+            st.metric("Suscriptores por Grupo", f"> {int(simulation['sample_size'].max()):,}")
+        else:
+            st.metric("Suscriptores por Grupo", f"{int(selected_row['sample_size']):,}")
+            st.metric("Usuarios-mes del Experimento", f"{int(selected_row['user_months']):,}")
+        st.dataframe(
+            required.rename(columns={
+                'effect': 'Diferencia (USD)',
+                'sample_size': 'Suscriptores por grupo',
+                'user_months': 'Usuarios-mes totales',
+            }),
+            hide_index=True
+        )
+    st.caption(
+        f"{simulation.groupby('sample_size').size().iloc[0]:,} experimentos simulados por tamaño, "
+        "remuestreando suscriptores completos y sus facturas mensuales; prueba t de Welch bilateral."
+    )
+
 # Pestaña de Pruebas Estadísticas
 with tabs[5]:
     st.markdown("<h2 class='section-header'>Pruebas Estadísticas</h2>", unsafe_allow_html=True)
@@ -900,11 +1130,11 @@ with tabs[5]:
     """)
     
     # Realizar prueba t de Student
-    ultimate_income = summary_with_plans[summary_with_plans['plan_name'] == 'ultimate']['total_monthly_cost']
-    surf_income = summary_with_plans[summary_with_plans['plan_name'] == 'surf']['total_monthly_cost']
+    ultimate_income, surf_income = plan_revenue_groups(summary_with_plans)
     
-    t_stat, p_value = stats.ttest_ind(ultimate_income, surf_income, equal_var=False)
     alpha = 0.05
+    plan_test = welch_test(ultimate_income, surf_income, alpha)
+    t_stat, p_value = plan_test['t_stat'], plan_test['p_value']
     
     col1, col2 = st.columns(2)
     
@@ -968,16 +1198,11 @@ with tabs[5]:
     """)
     
     # Identificar usuarios de NY-NJ vs otras regiones
-    ny_nj_income = summary_with_plans[
-        summary_with_plans['city'].str.contains('New York|Jersey', case=False, na=False)
-    ]['total_monthly_cost']
-    
-    other_regions_income = summary_with_plans[
-        ~summary_with_plans['city'].str.contains('New York|Jersey', case=False, na=False)
-    ]['total_monthly_cost']
+    ny_nj_income, other_regions_income = region_revenue_groups(summary_with_plans)
     
     # Realizar prueba t de Student
-    t_stat_region, p_value_region = stats.ttest_ind(ny_nj_income, other_regions_income, equal_var=False)
+    region_test = welch_test(ny_nj_income, other_regions_income, alpha)
+    t_stat_region, p_value_region = region_test['t_stat'], region_test['p_value']
     
     col1, col2 = st.columns(2)
     
@@ -1030,6 +1255,144 @@ with tabs[5]:
         )
         
         st.plotly_chart(fig, use_container_width=True)
+    
+    # Tamaño de muestra para experimentos de precios
+    st.markdown("<h3 class='subsection-header'>Análisis de Potencia para Experimentos de Precios</h3>", unsafe_allow_html=True)
+    
+    st.markdown("""
+    ¿Cuántos suscriptores y meses hacen falta para detectar una diferencia de ingresos? 
+    Simulamos miles de experimentos remuestreando la distribución empírica de `total_monthly_cost` 
+    del plan y medimos con qué frecuencia la prueba de Welch detecta la diferencia elegida.
+    """)
+    
+    power_analysis(dataset_version)
+
+# Simulador de escenarios como fragmento: mover un slider sólo vuelve a ejecutar
+# esta función (no el script completo) y usa parámetros de plan ya precalculados
+@st.fragment
+def scenario_simulator(plan_params):
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.subheader("Parámetros de Uso")
+        minutes_used = st.slider("Minutos de llamadas", 0, 5000, 500, key="sim_minutes")
+        messages_sent = st.slider("Mensajes enviados", 0, 1500, 50, key="sim_messages")
+        data_used_gb = st.slider("Datos utilizados (GB)", 0.0, 50.0, 10.0, key="sim_gb")
+    
+    with col2:
+        # Calcular costos para ambos planes con las reglas de facturación
+        # (el total de datos se cobra en GB completos)
+        data_used_mb = data_used_gb * 1024
+        surf = {k: to_dollars(v) for k, v in monthly_bill(plan_params['surf'], minutes_used, messages_sent, data_used_mb).items()}
+        ultimate = {k: to_dollars(v) for k, v in monthly_bill(plan_params['ultimate'], minutes_used, messages_sent, data_used_mb).items()}
+        surf_total = surf['total_monthly_cost']
+        ultimate_total = ultimate['total_monthly_cost']
+        
+        # Mostrar resultados
+        st.subheader("Resultados")
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.metric("Costo Total Plan Surf", f"${surf_total:.2f}")
+            st.write(f"- Tarifa base: ${surf['usd_monthly_pay']:.2f}")
+            st.write(f"- Costo extra por minutos: ${surf['extra_minute_cost']:.2f}")
+            st.write(f"- Costo extra por mensajes: ${surf['extra_message_cost']:.2f}")
+            st.write(f"- Costo extra por datos: ${surf['extra_mb_cost']:.2f}")
+            
+        with col2:
+            st.metric("Costo Total Plan Ultimate", f"${ultimate_total:.2f}")
+            st.write(f"- Tarifa base: ${ultimate['usd_monthly_pay']:.2f}")
+            st.write(f"- Costo extra por minutos: ${ultimate['extra_minute_cost']:.2f}")
+            st.write(f"- Costo extra por mensajes: ${ultimate['extra_message_cost']:.2f}")
+            st.write(f"- Costo extra por datos: ${ultimate['extra_mb_cost']:.2f}")
+        
+        # Recomendación
+        st.subheader("Recomendación")
+        if surf_total < ultimate_total:
+            st.success(f"Para este patrón de uso, el plan Surf es más económico por ${ultimate_total - surf_total:.2f}.")
+        elif ultimate_total < surf_total:
+            st.success(f"Para este patrón de uso, el plan Ultimate es más económico por ${surf_total - ultimate_total:.2f}.")
+        else:
+            st.info("Ambos planes tienen el mismo costo para este patrón de uso.")
+
+# Curvas de costo por dimensión y valores fijos, con un segundo eje declarado en el
+# layout de un go.Figure; se reutilizan mientras no cambien los valores
+@st.cache_resource(max_entries=64)
+def load_cost_curve_figure(dataset_version, dimension, minutes, messages, gb):
+    _, plans, _ = load_data()
+    fixed_usage = {'minutes': minutes, 'messages': messages, 'gb': gb}
+    curves = cost_curves(plans, dimension, fixed_usage)
+    break_evens = break_even_points(plans, dimension, fixed_usage)
+    distribution = load_usage_distribution(dataset_version, dimension)
+    dimension_label = USAGE_DIMENSIONS[dimension]['label']
+    plan_colors = {'surf': '#1E88E5', 'ultimate': '#43A047'}
+    
+    fig = go.Figure()
+    for plan_name, plan_rows in distribution.groupby('plan_name', sort=False):
+        fig.add_trace(go.Bar(
+            x=(plan_rows['bin_start'] + plan_rows['bin_end']) / 2,
+            y=plan_rows['rows'],
+            width=plan_rows['bin_end'] - plan_rows['bin_start'],
+            name=f"Usuarios-mes {plan_name.capitalize()}",
+            marker_color=plan_colors.get(plan_name),
+            opacity=0.25,
+            yaxis='y2'
+        ))
+    for plan_name in plans['plan_name']:
+        fig.add_trace(go.Scatter(
+            x=curves[dimension],
+            y=curves[plan_name],
+            mode='lines',
+            name=f"Costo {plan_name.capitalize()}",
+            line=dict(color=plan_colors.get(plan_name), width=3)
+        ))
+    for threshold in break_evens['threshold']:
+        fig.add_vline(x=threshold, line_dash='dash', line_color='gray')
+    fig.add_vline(x=fixed_usage[dimension], line_dash='dot', line_color='black')
+    fig.update_layout(
+        title=f"Costo mensual por plan: {dimension_label}",
+        xaxis_title=dimension_label,
+        yaxis=dict(title="Costo mensual (USD)"),
+        yaxis2=dict(title="Usuarios-mes", overlaying='y', side='right', showgrid=False),
+        barmode='overlay',
+        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1)
+    )
+    return fig, freeze(break_evens)
+
+# Curvas de costo como fragmento aparte: mover un slider del simulador sólo recalcula
+# las facturas; las curvas toman los valores del simulador al ejecutarse este fragmento
+@st.fragment
+def cost_curve_analysis(dataset_version):
+    st.subheader("Curvas de Costo y Puntos de Equilibrio")
+    curve_dimension = st.radio(
+        "Variar:",
+        list(USAGE_DIMENSIONS),
+        format_func=lambda d: USAGE_DIMENSIONS[d]['label'],
+        horizontal=True,
+        key="curve_dimension"
+    )
+    st.button("Actualizar con los valores del simulador", key="refresh_cost_curves")
+    # Una dimensión recorre todo el rango del slider y las otras dos quedan fijas
+    fixed_usage = {d: st.session_state[f'sim_{d}'] for d in USAGE_DIMENSIONS}
+    fig, break_evens = load_cost_curve_figure(dataset_version, curve_dimension, **fixed_usage)
+    dimension_label = USAGE_DIMENSIONS[curve_dimension]['label']
+    st.caption(
+        "Valores fijos: " + ", ".join(
+            f"{USAGE_DIMENSIONS[d]['label']} = {v:,}" for d, v in fixed_usage.items() if d != curve_dimension
+        ) + ". Tras mover los sliders, use «Actualizar» para recalcular las curvas."
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    
+    if break_evens.empty:
+        st.info(f"Con los demás valores fijos, ningún par de planes cambia de orden en todo el rango de «{dimension_label}».")
+    for row in break_evens.itertuples(index=False):
+        st.write(
+            f"- Equilibrio {row.plan_a.capitalize()} / {row.plan_b.capitalize()}: "
+            f"{dimension_label} = **{row.threshold:,.1f}**, costo ${row.cost:.2f}; "
+            f"por debajo conviene {row.cheaper_below.capitalize()}, por encima {row.cheaper_above.capitalize()}."
+        )
+    if curve_dimension == 'gb':
+        st.caption("Los datos se cobran en GB completos: el umbral se alcanza al superar el GB anterior.")
 
 # Pestaña de Conclusiones
 with tabs[6]:
@@ -1073,68 +1436,390 @@ with tabs[6]:
     Utilice este simulador para explorar cómo diferentes patrones de uso afectarían los costos mensuales en ambos planes:
     """)
     
-    col1, col2 = st.columns(2)
+    scenario_simulator(load_plan_parameters())
+    cost_curve_analysis(dataset_version)
+
+# Pestaña de Suscriptores
+with tabs[7]:
+    st.markdown("<h2 class='section-header'>Consulta por Suscriptor</h2>", unsafe_allow_html=True)
     
-    with col1:
-        st.subheader("Parámetros de Uso")
-        minutes_used = st.slider("Minutos de llamadas", 0, 5000, 500)
-        messages_sent = st.slider("Mensajes enviados", 0, 1500, 50)
-        data_used_gb = st.slider("Datos utilizados (GB)", 0.0, 50.0, 10.0)
+    subscriber_index, user_profiles = load_subscriber_index(dataset_version)
+    
+    selected_user = st.number_input(
+        "ID de usuario",
+        min_value=int(user_profiles.index.min()),
+        max_value=int(user_profiles.index.max()),
+        value=int(user_profiles.index.min()),
+        step=1
+    )
     
+    if selected_user not in user_profiles.index:
+        st.warning("No existe un usuario con ese ID.")
+    else:
+        profile = user_profiles.loc[selected_user]
+        history = subscriber_index.rows(selected_user)
+        history = history.assign(**{c: to_dollars(history[c]) for c in MONEY_COLUMNS})
+        
+        # Estado del suscriptor
+        info1, info2, info3, info4 = st.columns(4)
+        with info1:
+            st.metric("Plan", profile['plan'].capitalize())
+        with info2:
+            st.metric("Ciudad", profile['city'])
+        with info3:
+            churn_status = "Activo" if pd.isna(profile['churn_date']) else f"Abandonó ({profile['churn_date']:%Y-%m-%d})"
+            st.metric("Estado", churn_status)
+        with info4:
+            st.metric("Facturación Total", f"${history['total_monthly_cost'].sum():,.2f}")
+        
+        if history.empty:
+            st.info("El suscriptor no tiene consumo registrado.")
+        else:
+            # Uso mensual y desglose de la factura
+            st.markdown("<h3 class='subsection-header'>Historial Mensual</h3>", unsafe_allow_html=True)
+            
+            bill_history = pd.DataFrame({
+                'Mes': history['month'].astype(str),
+                'Minutos': history['total_minutes'],
+                'Mensajes': history['messages_count'],
+                'Datos (GB)': (history['usage_mb'] / 1024).round(2),
+                'Tarifa Base': history['usd_monthly_pay'],
+                'Minutos Extra': history['extra_minute_cost'].round(2),
+                'Mensajes Extra': history['extra_message_cost'].round(2),
+                'Datos Extra': history['extra_mb_cost'].round(2),
+                'Total ($)': history['total_monthly_cost'].round(2)
+            })
+            st.dataframe(bill_history.set_index('Mes'), use_container_width=True)
+            
+            bill_long = bill_history.melt(
+                id_vars='Mes',
+                value_vars=['Tarifa Base', 'Minutos Extra', 'Mensajes Extra', 'Datos Extra'],
+                var_name='Componente',
+                value_name='Monto'
+            )
+            fig = px.bar(
+                bill_long,
+                x='Mes',
+                y='Monto',
+                color='Componente',
+                title='Desglose de la Factura por Mes',
+                labels={'Monto': 'Monto ($)'},
+                color_discrete_sequence=['#1E88E5', '#43A047', '#FFC107', '#E53935']
+            )
+            st.plotly_chart(fig, use_container_width=True)
+            
+            # Comparación con los demás planes para el mismo consumo
+            st.markdown("<h3 class='subsection-header'>Comparación de Planes</h3>", unsafe_allow_html=True)
+            
+            plan_costs = cost_under_plans(history, plans)
+            plan_costs.index = history['month'].astype(str)
+            plan_totals = plan_costs.sum()
+            cheapest_plan = plan_totals.idxmin()
+            
+            st.dataframe(
+                plan_costs.round(2).rename(columns=lambda p: f"Plan {p.capitalize()} ($)"),
+                use_container_width=True
+            )
+            
+            if cheapest_plan == profile['plan']:
+                st.success(f"El plan actual ({profile['plan'].capitalize()}) es el más económico para este consumo.")
+            else:
+                savings = plan_totals[profile['plan']] - plan_totals[cheapest_plan]
+                st.warning(
+                    f"Con el plan {cheapest_plan.capitalize()} este suscriptor habría pagado "
+                    f"${savings:,.2f} menos en el periodo."
+                )
+
+# Pestaña de Anomalías
+with tabs[8]:
+    st.markdown("<h2 class='section-header'>Detección de Anomalías de Uso</h2>", unsafe_allow_html=True)
+    
+    st.markdown("""
+    Cada mes de cada suscriptor se compara con la media y la dispersión móviles exponenciales (EWMA) de sus meses anteriores;
+    los picos se recortan antes de entrar a la línea base, así que un mes atípico no oculta los siguientes.
+    Se marcan los meses cuyo puntaje z supera el umbral (por ejemplo, un mes con 10 veces los datos habituales).
+    """)
+    
+    metric_names = {
+        'total_minutes': 'Minutos',
+        'messages_count': 'Mensajes',
+        'usage_mb': 'Datos (MB)'
+    }
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        z_threshold = st.slider("Umbral de puntaje z", 2.0, 10.0, 4.0, step=0.5)
     with col2:
-        # Calcular costos para ambos planes
-        data_used_mb = data_used_gb * 1024
-        
-        # Plan Surf
-        surf_base = plans.loc[plans['plan_name'] == 'surf', 'usd_monthly_pay'].values[0]
-        surf_min_included = plans.loc[plans['plan_name'] == 'surf', 'minutes_included'].values[0]
-        surf_msg_included = plans.loc[plans['plan_name'] == 'surf', 'messages_included'].values[0]
-        surf_data_included = plans.loc[plans['plan_name'] == 'surf', 'mb_per_month_included'].values[0]
-        
-        surf_extra_min = max(0, minutes_used - surf_min_included) * plans.loc[plans['plan_name'] == 'surf', 'usd_per_minute'].values[0]
-        surf_extra_msg = max(0, messages_sent - surf_msg_included) * plans.loc[plans['plan_name'] == 'surf', 'usd_per_message'].values[0]
-        surf_extra_data = max(0, data_used_mb - surf_data_included) / 1024 * plans.loc[plans['plan_name'] == 'surf', 'usd_per_gb'].values[0]
-        
-        surf_total = surf_base + surf_extra_min + surf_extra_msg + surf_extra_data
-        
-        # Plan Ultimate
-        ultimate_base = plans.loc[plans['plan_name'] == 'ultimate', 'usd_monthly_pay'].values[0]
-        ultimate_min_included = plans.loc[plans['plan_name'] == 'ultimate', 'minutes_included'].values[0]
-        ultimate_msg_included = plans.loc[plans['plan_name'] == 'ultimate', 'messages_included'].values[0]
-        ultimate_data_included = plans.loc[plans['plan_name'] == 'ultimate', 'mb_per_month_included'].values[0]
-        
-        ultimate_extra_min = max(0, minutes_used - ultimate_min_included) * plans.loc[plans['plan_name'] == 'ultimate', 'usd_per_minute'].values[0]
-        ultimate_extra_msg = max(0, messages_sent - ultimate_msg_included) * plans.loc[plans['plan_name'] == 'ultimate', 'usd_per_message'].values[0]
-        ultimate_extra_data = max(0, data_used_mb - ultimate_data_included) / 1024 * plans.loc[plans['plan_name'] == 'ultimate', 'usd_per_gb'].values[0]
+        min_history = st.slider("Meses mínimos de historial", 1, 5, 3)
+    
+    anomalies = rank_anomalies(load_anomaly_scores(dataset_version), z_threshold=z_threshold, min_history=min_history)
+    anomalies = anomalies.assign(
+        metric_label=anomalies['metric'].map(metric_names),
+        month_str=anomalies['month'].astype(str)
+    )
+    
+    st.metric("Meses Anómalos Detectados", f"{len(anomalies):,}")
+    
+    if anomalies.empty:
+        st.info("No se detectaron anomalías con el umbral seleccionado.")
+    else:
+        # Tabla ordenada por puntaje
+        st.markdown("<h3 class='subsection-header'>Anomalías Principales</h3>", unsafe_allow_html=True)
+        st.dataframe(
+            anomalies.head(100)[['user_id', 'month_str', 'plan_name', 'metric_label', 'value', 'baseline', 'ratio', 'z_score']]
+            .rename(columns={
+                'user_id': 'Usuario',
+                'month_str': 'Mes',
+                'plan_name': 'Plan',
+                'metric_label': 'Métrica',
+                'value': 'Valor',
+                'baseline': 'Línea Base',
+                'ratio': 'Veces la Base',
+                'z_score': 'Puntaje z'
+            })
+            .round(2),
+            use_container_width=True,
+            hide_index=True
+        )
         
-        ultimate_total = ultimate_base + ultimate_extra_min + ultimate_extra_msg + ultimate_extra_data
+        # Anomalías por mes y métrica
+        anomalies_by_month = anomalies.groupby(['month_str', 'metric_label']).size().reset_index(name='count')
+        fig = px.bar(
+            anomalies_by_month,
+            x='month_str',
+            y='count',
+            color='metric_label',
+            barmode='group',
+            title='Meses Anómalos por Mes y Métrica',
+            labels={
+                'month_str': 'Mes',
+                'count': 'Número de Anomalías',
+                'metric_label': 'Métrica'
+            },
+            color_discrete_sequence=['#1E88E5', '#43A047', '#FFC107']
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+# Pestaña de Segmentos
+with tabs[9]:
+    st.markdown("<h2 class='section-header'>Segmentación de Clientes</h2>", unsafe_allow_html=True)
+    
+    st.markdown("""
+    Los suscriptores se agrupan con k-means por mini-lotes según su perfil promedio:
+    minutos, mensajes, GB, frecuencia de excedentes e ingreso mensual.
+    Los segmentos se numeran de menor a mayor ingreso promedio.
+    """)
+    
+    n_segments = st.slider("Número de segmentos", 2, 8, 4)
+    user_segments, centroids = load_segments(dataset_version, n_segments)
+    
+    segment_summary = user_segments.groupby('segment').agg(
+        users=('user_id', 'size'),
+        mean_revenue=('mean_revenue', 'mean'),
+        monthly_revenue=('mean_revenue', 'sum'),
+        surf_share=('plan_name', lambda p: (p == 'surf').mean() * 100)
+    ).reset_index()
+    segment_summary['segment_label'] = 'Segmento ' + segment_summary['segment'].astype(str)
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        fig = px.bar(
+            segment_summary,
+            x='segment_label',
+            y='users',
+            color='segment_label',
+            title='Tamaño de cada Segmento',
+            labels={
+                'segment_label': 'Segmento',
+                'users': 'Número de Usuarios'
+            }
+        )
+        st.plotly_chart(fig, use_container_width=True)
         
-        # Mostrar resultados
-        st.subheader("Resultados")
+    with col2:
+        fig = px.bar(
+            segment_summary,
+            x='segment_label',
+            y='monthly_revenue',
+            color='segment_label',
+            title='Ingreso Mensual por Segmento',
+            labels={
+                'segment_label': 'Segmento',
+                'monthly_revenue': 'Ingreso Mensual Total ($)'
+            }
+        )
+        st.plotly_chart(fig, use_container_width=True)
+    
+    # Centroides en unidades originales
+    st.markdown("<h3 class='subsection-header'>Perfil de cada Segmento (Centroides)</h3>", unsafe_allow_html=True)
+    
+    centroid_table = centroids.assign(
+        overage_rate=centroids['overage_rate'] * 100,
+        users=segment_summary.set_index('segment')['users'],
+        surf_share=segment_summary.set_index('segment')['surf_share']
+    ).rename(columns={
+        'mean_minutes': 'Minutos Promedio',
+        'mean_messages': 'Mensajes Promedio',
+        'mean_gb': 'GB Promedio',
+        'overage_rate': 'Meses con Excedente (%)',
+        'mean_revenue': 'Ingreso Promedio ($)',
+        'users': 'Usuarios',
+        'surf_share': 'Usuarios Surf (%)'
+    })
+    centroid_table.index = 'Segmento ' + centroid_table.index.astype(str)
+    st.dataframe(centroid_table.round(2), use_container_width=True)
+    
+    # Distribución de usuarios por segmento (muestra para graficar)
+    plot_sample = user_segments.sample(min(len(user_segments), 5000), random_state=42)
+    fig = px.scatter(
+        plot_sample.assign(segment_label='Segmento ' + plot_sample['segment'].astype(str)),
+        x='mean_minutes',
+        y='mean_gb',
+        color='segment_label',
+        size='mean_revenue',
+        title='Usuarios por Segmento: Minutos vs GB',
+        labels={
+            'mean_minutes': 'Minutos Promedio',
+            'mean_gb': 'GB Promedio',
+            'segment_label': 'Segmento',
+            'mean_revenue': 'Ingreso Promedio ($)'
+        }
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+# Pestaña de Uso Diario
+with tabs[10]:
+    st.markdown("<h2 class='section-header'>Uso Diario y Cruce de Límites</h2>", unsafe_allow_html=True)
+    
+    st.markdown("""
+    El uso de cada suscriptor se acumula día a día dentro del mes para encontrar el día exacto
+    en que supera los minutos, mensajes o datos incluidos en su plan.
+    """)
+    
+    limit_names = {
+        'total_minutes': 'Minutos',
+        'messages_count': 'Mensajes',
+        'usage_mb': 'Datos'
+    }
+    limit_metric = st.radio(
+        "Límite:",
+        list(limit_names),
+        format_func=limit_names.get,
+        horizontal=True,
+        key="limit_metric"
+    )
+    
+    crossings = load_limit_crossings(dataset_version)
+    crossings = crossings[crossings['month'].isin(selected_months)]
+    full_summary = load_data()[2]
+    months_per_plan = full_summary[full_summary['month'].isin(selected_months)].groupby('plan_name').size()
+    distribution = crossing_day_distribution(crossings, months_per_plan)
+    distribution = distribution[distribution['metric'] == limit_metric]
+    metric_crossings = crossings[crossings['metric'] == limit_metric]
+    
+    # Resumen por plan
+    plan_cols = st.columns(len(plans))
+    for col, plan_name in zip(plan_cols, plans['plan_name']):
+        plan_crossings = metric_crossings[metric_crossings['plan_name'] == plan_name]
+        share = len(plan_crossings) / months_per_plan.get(plan_name, 0) * 100 if months_per_plan.get(plan_name, 0) else 0.0
+        with col:
+            st.metric(
+                f"Usuarios-mes que superan el límite ({plan_name.capitalize()})",
+                f"{share:.1f}%",
+                delta=(f"Día mediano de cruce: {plan_crossings['crossing_day'].median():.0f}"
+                       if len(plan_crossings) else "Sin cruces"),
+                delta_color="off"
+            )
+    
+    if distribution.empty:
+        st.info("Ningún suscriptor superó este límite en los meses seleccionados.")
+    else:
         col1, col2 = st.columns(2)
-        
         with col1:
-            st.metric("Costo Total Plan Surf", f"${surf_total:.2f}")
-            st.write(f"- Tarifa base: ${surf_base:.2f}")
-            st.write(f"- Costo extra por minutos: ${surf_extra_min:.2f}")
-            st.write(f"- Costo extra por mensajes: ${surf_extra_msg:.2f}")
-            st.write(f"- Costo extra por datos: ${surf_extra_data:.2f}")
-            
+            fig = px.bar(
+                distribution,
+                x='crossing_day',
+                y='user_months',
+                color='plan_name',
+                barmode='group',
+                title=f'Día del Mes en que se Supera el Límite de {limit_names[limit_metric]}',
+                labels={
+                    'crossing_day': 'Día del Mes',
+                    'user_months': 'Usuarios-Mes',
+                    'plan_name': 'Plan'
+                },
+                color_discrete_map={'surf': '#1E88E5', 'ultimate': '#43A047'}
+            )
+            st.plotly_chart(fig, use_container_width=True)
         with col2:
-            st.metric("Costo Total Plan Ultimate", f"${ultimate_total:.2f}")
-            st.write(f"- Tarifa base: ${ultimate_base:.2f}")
-            st.write(f"- Costo extra por minutos: ${ultimate_extra_min:.2f}")
-            st.write(f"- Costo extra por mensajes: ${ultimate_extra_msg:.2f}")
-            st.write(f"- Costo extra por datos: ${ultimate_extra_data:.2f}")
-        
-        # Recomendación
-        st.subheader("Recomendación")
-        if surf_total < ultimate_total:
-            st.success(f"Para este patrón de uso, el plan Surf es más económico por ${ultimate_total - surf_total:.2f}.")
-        elif ultimate_total < surf_total:
-            st.success(f"Para este patrón de uso, el plan Ultimate es más económico por ${surf_total - ultimate_total:.2f}.")
-        else:
-            st.info("Ambos planes tienen el mismo costo para este patrón de uso.")
+            fig = px.line(
+                distribution,
+                x='crossing_day',
+                y='cumulative_share',
+                color='plan_name',
+                markers=True,
+                title='Porcentaje Acumulado de Usuarios-Mes sobre el Límite',
+                labels={
+                    'crossing_day': 'Día del Mes',
+                    'cumulative_share': 'Usuarios-Mes sobre el Límite (%)',
+                    'plan_name': 'Plan'
+                },
+                color_discrete_map={'surf': '#1E88E5', 'ultimate': '#43A047'}
+            )
+            st.plotly_chart(fig, use_container_width=True)
+    
+    # Proyección de la factura a mitad de mes
+    st.markdown("<h3 class='subsection-header'>Proyección de Factura a Mitad de Mes</h3>", unsafe_allow_html=True)
+    
+    nowcast_month = all_months[-1]
+    st.markdown(f"""
+    Con el uso acumulado de **{nowcast_month}** hasta el día de corte y el historial de cada suscriptor,
+    se proyecta el consumo y la factura de fin de mes y la probabilidad de pagar excedentes.
+    """)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        as_of_day = st.slider("Día de corte", 1, nowcast_month.days_in_month - 1, 15)
+    with col2:
+        risk_threshold = st.slider("Probabilidad mínima de excedente", 0.5, 0.99, 0.8, step=0.01)
+    
+    nowcast = load_nowcast(dataset_version, str(nowcast_month.start_time.date().replace(day=as_of_day)))
+    at_risk = rank_at_risk(nowcast, min_probability=risk_threshold)
+    
+    risk1, risk2, risk3 = st.columns(3)
+    with risk1:
+        st.metric("Suscriptores Activos", f"{len(nowcast):,}")
+    with risk2:
+        st.metric("En Riesgo de Excedente", f"{len(at_risk):,}")
+    with risk3:
+        st.metric("Excedente Proyectado en Riesgo", f"${to_dollars(at_risk['projected_extra_cost'].sum()):,.2f}")
+    
+    if at_risk.empty:
+        st.info("Ningún suscriptor supera la probabilidad mínima de excedente.")
+    else:
+        st.dataframe(
+            at_risk.head(100).assign(
+                gb_projected=(at_risk['usage_mb_projected'] / 1024).round(1),
+                overage_pct=(at_risk['overage_probability'] * 100).round(1),
+                extra_usd=to_dollars(at_risk['projected_extra_cost']),
+                total_usd=to_dollars(at_risk['projected_monthly_cost'])
+            )[['user_id', 'plan_name', 'city', 'total_minutes_projected', 'messages_count_projected',
+               'gb_projected', 'overage_pct', 'extra_usd', 'total_usd']]
+            .rename(columns={
+                'user_id': 'Usuario',
+                'plan_name': 'Plan',
+                'city': 'Ciudad',
+                'total_minutes_projected': 'Minutos Proyectados',
+                'messages_count_projected': 'Mensajes Proyectados',
+                'gb_projected': 'GB Proyectados',
+                'overage_pct': 'Probabilidad de Excedente (%)',
+                'extra_usd': 'Excedente Proyectado ($)',
+                'total_usd': 'Factura Proyectada ($)'
+            }),
+            use_container_width=True,
+            hide_index=True
+        )
 
 # Información 
 st.markdown("""
@@ -0,0 +1,327 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+# Columnas de summary_with_plans, en el orden que usa el dashboard
+SUMMARY_COLUMNS = [
+    'user_id', 'month', 'plan_name', 'city',
+    'total_minutes', 'messages_count', 'usage_mb',
+    'extra_minutes', 'extra_messages', 'extra_mb',
+    'extra_minute_cost', 'extra_message_cost', 'extra_mb_cost', 'total_monthly_cost',
+    'usd_monthly_pay', 'minutes_included', 'messages_included', 'mb_per_month_included',
+]
+
+MB_PER_GB = 1024
+
+# Dinero: las columnas de costo se guardan en centavos enteros. int32 alcanza para
+# cualquier factura mensual (hasta ~21 millones de USD) y las sumas se hacen en int64
+CENTS_PER_DOLLAR = 100
+MONEY_COLUMNS = ['extra_minute_cost', 'extra_message_cost', 'extra_mb_cost', 'total_monthly_cost', 'usd_monthly_pay']
+MONEY_DTYPE = np.int32
+
+# Las tarifas por unidad se expresan en milésimas de centavo para multiplicar en enteros
+_RATE_SCALE = 1000
+
+# La clave (user_id, periodo) se empaqueta en un solo int64: user_id en los bits altos
+# y el ordinal del periodo (meses o días desde 1970-01-01) en los bajos
+_PERIOD_BITS = 20
+
+
+def to_cents(dollars):
+    """Convierte montos en dólares a centavos enteros (int64), redondeando al centavo."""
+    return np.rint(np.asarray(dollars, dtype=float) * CENTS_PER_DOLLAR).astype(np.int64)
+
+
+def to_dollars(cents):
+    """Convierte centavos a dólares (float) para mostrar; acepta escalares, arreglos o Series."""
+    return cents / CENTS_PER_DOLLAR
+
+
+def line_cents(units, usd_per_unit):
+    """Importe en centavos de un concepto de la factura: ``units`` enteras por la tarifa.
+
+    El producto se calcula en enteros (tarifa en milésimas de centavo) y se
+    redondea una vez al centavo, con la mitad hacia arriba, como en la factura
+    emitida. Admite difusión de NumPy entre unidades y tarifas.
+    """
+    units = np.rint(np.asarray(units, dtype=float)).astype(np.int64)
+    rate = np.rint(np.asarray(usd_per_unit, dtype=float) * CENTS_PER_DOLLAR * _RATE_SCALE).astype(np.int64)
+    return (units * rate + _RATE_SCALE // 2) // _RATE_SCALE
+
+
+def _period_ordinals(dates, freq='M'):
+    return pd.to_datetime(dates).to_numpy().astype(f'datetime64[{freq}]').astype(np.int64)
+
+
+def _event_keys(user_ids, dates, freq='M'):
+    return (np.asarray(user_ids, dtype=np.int64) << _PERIOD_BITS) | _period_ordinals(dates, freq)
+
+
+def _periods_from_ordinals(ordinals):
+    return pd.PeriodIndex(ordinals.astype('datetime64[M]'), freq='M')
+
+
+def aggregate_events(calls, messages, internet, freq='M'):
+    """Agrega llamadas, mensajes y sesiones a totales por (user_id, month).
+
+    Aplica las reglas de tarificación por evento del notebook: cada llamada se
+    redondea al minuto superior y cada sesión con consumo cobra al menos 1 MB y
+    se redondea al MB superior; las sesiones de 0 MB no son consumo y se
+    descartan. Ordena todos los eventos una sola vez por (user_id, month) y
+    suma cada segmento con ``np.add.reduceat``. Con ``freq='D'`` agrega por
+    (user_id, date) en lugar de por mes.
+    """
+    # Reglas por evento
+    call_minutes = np.ceil(calls['duration'].to_numpy(dtype=float))
+    mb_used = internet['mb_used'].to_numpy(dtype=float)
+    billed_sessions = mb_used > 0
+    session_mb = np.maximum(np.ceil(mb_used[billed_sessions]), 1)
+
+    keys = np.concatenate([
+        _event_keys(calls['user_id'], calls['call_date'], freq),
+        _event_keys(messages['user_id'], messages['message_date'], freq),
+        _event_keys(internet['user_id'].to_numpy()[billed_sessions],
+                    internet['session_date'].to_numpy()[billed_sessions], freq),
+    ])
+
+    # Una columna por métrica; cada evento sólo aporta a la suya
+    n_calls, n_messages = len(call_minutes), len(messages)
+    values = np.zeros((len(keys), 3))
+    values[:n_calls, 0] = call_minutes
+    values[n_calls:n_calls + n_messages, 1] = 1
+    values[n_calls + n_messages:, 2] = session_mb
+
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    if len(sorted_keys) == 0:
+        starts = np.empty(0, dtype=np.int64)
+    else:
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    totals = np.add.reduceat(values[order], starts, axis=0) if len(starts) else values[:0]
+    segment_keys = sorted_keys[starts]
+    ordinals = segment_keys & ((1 << _PERIOD_BITS) - 1)
+    if freq == 'M':
+        period_column, periods = 'month', _periods_from_ordinals(ordinals)
+    else:
+        period_column, periods = 'date', ordinals.astype(f'datetime64[{freq}]')
+
+    return pd.DataFrame({
+        'user_id': segment_keys >> _PERIOD_BITS,
+        period_column: periods,
+        'total_minutes': totals[:, 0],
+        'messages_count': totals[:, 1],
+        'usage_mb': totals[:, 2],
+    })
+
+
+def plan_history_from_users(users):
+    """Historial de planes con un único intervalo abierto por usuario (su plan actual).
+
+    El intervalo empieza en ``reg_date`` si existe; ``valid_to`` vacío significa
+    que el plan sigue vigente.
+    """
+    valid_from = users['reg_date'].to_numpy() if 'reg_date' in users else np.full(len(users), np.datetime64('NaT', 's'))
+    return pd.DataFrame({
+        'user_id': users['user_id'].to_numpy(),
+        'plan': users['plan'].to_numpy(),
+        'valid_from': pd.to_datetime(valid_from),
+        'valid_to': pd.NaT,
+    })
+
+
+def _day_ordinals(dates, missing):
+    # Días desde 1970-01-01; las fechas vacías toman ``missing`` (intervalo abierto)
+    days = pd.to_datetime(dates).to_numpy().astype('datetime64[D]')
+    return np.where(np.isnat(days), missing, days.astype(np.int64))
+
+
+def resolve_plans(user_ids, months, plan_history):
+    """Plan vigente de cada (user_id, mes) mediante una unión de intervalos ordenada.
+
+    ``plan_history`` tiene ``user_id``, ``plan``, ``valid_from`` y ``valid_to``
+    (exclusivo; vacío = vigente) sin solapamientos por usuario. Rige el último
+    intervalo que empieza a más tardar el último día del mes y sigue vigente al
+    comenzar el mes, así que un cambio a mitad de mes se factura desde ese mes.
+    El historial se ordena una vez por clave empaquetada (user_id, valid_from)
+    y cada fila se resuelve con ``np.searchsorted``. Devuelve un arreglo de
+    nombres de plan con ``None`` donde no hay plan vigente.
+    """
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+    month_start = np.asarray(months, dtype=np.int64).astype('datetime64[M]')
+    first_day = month_start.astype('datetime64[D]').astype(np.int64)
+    last_day = (month_start + 1).astype('datetime64[D]').astype(np.int64) - 1
+
+    history_users = plan_history['user_id'].to_numpy(dtype=np.int64)
+    history_keys = (history_users << _PERIOD_BITS) | _day_ordinals(plan_history['valid_from'], 0)
+    order = np.argsort(history_keys, kind='stable')
+    history_keys, history_users = history_keys[order], history_users[order]
+    valid_to = _day_ordinals(plan_history['valid_to'], np.iinfo(np.int64).max)[order]
+    # Los planes viajan como códigos enteros; el código -1 toma el ``None`` final
+    plan_codes, plan_labels = pd.factorize(plan_history['plan'].to_numpy()[order])
+    plan_labels = np.append(np.asarray(plan_labels, dtype=object), None)
+
+    position = np.searchsorted(history_keys, (user_ids << _PERIOD_BITS) | last_day, side='right') - 1
+    candidate = np.maximum(position, 0)
+    in_force = (
+        (position >= 0)
+        & (history_users[candidate] == user_ids)
+        & (valid_to[candidate] > first_day)
+    )
+    return plan_labels[np.where(in_force, plan_codes[candidate], -1)]
+
+
+def bill_lines(plan, total_minutes, messages_count, usage_mb):
+    """Reglas de la factura mensual: única implementación de la tarificación.
+
+    ``plan`` mapea cada columna de ``plans`` a un valor o arreglo y el uso
+    puede ser escalar o arreglo; todo se combina con difusión de NumPy (una
+    fila por plan, una rejilla uso × plan o un solo mes). El total de MB se
+    cobra en GB completos y cada concepto se cobra en centavos enteros con
+    ``line_cents``; el total es la suma de los conceptos. Devuelve los
+    excedentes (``extra_minutes``, ``extra_messages``, ``extra_gb``) y las
+    columnas de ``MONEY_COLUMNS`` en centavos (int64).
+    """
+    extra_minutes = np.maximum(0, np.asarray(total_minutes, dtype=float) - plan['minutes_included'])
+    extra_messages = np.maximum(0, np.asarray(messages_count, dtype=float) - plan['messages_included'])
+    billed_gb = np.ceil(np.asarray(usage_mb, dtype=float) / MB_PER_GB)
+    extra_gb = np.maximum(0, billed_gb - np.asarray(plan['mb_per_month_included'], dtype=float) / MB_PER_GB)
+
+    base_fee = to_cents(plan['usd_monthly_pay'])
+    extra_minute_cost = line_cents(extra_minutes, plan['usd_per_minute'])
+    extra_message_cost = line_cents(extra_messages, plan['usd_per_message'])
+    extra_mb_cost = line_cents(extra_gb, plan['usd_per_gb'])
+    return {
+        'extra_minutes': extra_minutes,
+        'extra_messages': extra_messages,
+        'extra_gb': extra_gb,
+        'extra_minute_cost': extra_minute_cost,
+        'extra_message_cost': extra_message_cost,
+        'extra_mb_cost': extra_mb_cost,
+        'total_monthly_cost': base_fee + extra_minute_cost + extra_message_cost + extra_mb_cost,
+        'usd_monthly_pay': base_fee,
+    }
+
+
+def rate_usage(usage, users, plans, plan_history=None):
+    """Calcula excedentes y costos de cada fila (user_id, month) según el plan del usuario.
+
+    ``usage`` debe traer minutos y MB ya redondeados por evento. El total
+    mensual de MB se redondea al GB superior antes de compararlo con el límite
+    del plan. Los importes salen de ``bill_lines``, así que las columnas de
+    ``MONEY_COLUMNS`` son ``MONEY_DTYPE`` en centavos. Lanza ``ValueError`` si
+    una fila es de un usuario que no está en ``users`` o de un plan que no
+    está en ``plans``. Devuelve exactamente las columnas de
+    ``SUMMARY_COLUMNS``. Con ``plan_history`` cada mes se factura con el plan
+    vigente en ese mes (``resolve_plans``); sin él, con el plan de ``users``.
+    """
+    # Búsqueda ordenada del usuario de cada fila en lugar de un merge por hash
+    users_sorted = users.sort_values('user_id')
+    user_keys = users_sorted['user_id'].to_numpy()
+    usage_users = usage['user_id'].to_numpy()
+    user_pos = np.minimum(np.searchsorted(user_keys, usage_users), max(len(user_keys) - 1, 0))
+    unknown_users = (user_keys[user_pos] != usage_users) if len(user_keys) else np.ones(len(usage_users), dtype=bool)
+    if unknown_users.any():
+        raise ValueError(
+            f"{int(unknown_users.sum())} filas de uso son de usuarios que no están en users "
+            f"(por ejemplo user_id={usage_users[unknown_users][0]})"
+        )
+    cities = users_sorted['city'].to_numpy()[user_pos]
+    if plan_history is None:
+        plan_names = users_sorted['plan'].to_numpy()[user_pos]
+    else:
+        plan_names = resolve_plans(usage_users, usage['month'].array.asi8, plan_history)
+        missing = pd.isna(plan_names)
+        if missing.any():
+            raise ValueError(f"{int(missing.sum())} filas usuario-mes no tienen un plan vigente en plan_history")
+
+    plan_pos = pd.Index(plans['plan_name']).get_indexer(plan_names)
+    if (plan_pos < 0).any():
+        unknown_plans = sorted(map(str, pd.unique(np.asarray(plan_names, dtype=object)[plan_pos < 0])))
+        raise ValueError(f"Planes que no están en plans: {', '.join(unknown_plans)}")
+    plan = {col: plans[col].to_numpy()[plan_pos] for col in plans.columns}
+
+    total_minutes = usage['total_minutes'].to_numpy(dtype=float)
+    messages_count = usage['messages_count'].to_numpy(dtype=float)
+    usage_mb = usage['usage_mb'].to_numpy(dtype=float)
+    bill = bill_lines(plan, total_minutes, messages_count, usage_mb)
+
+    summary = pd.DataFrame({
+        'user_id': usage['user_id'].to_numpy(),
+        'month': usage['month'].array,
+        'plan_name': plan_names,
+        'city': cities,
+        'total_minutes': total_minutes,
+        'messages_count': messages_count,
+        'usage_mb': usage_mb,
+        'extra_minutes': bill['extra_minutes'],
+        'extra_messages': bill['extra_messages'],
+        'extra_mb': bill['extra_gb'] * MB_PER_GB,
+        **{col: bill[col].astype(MONEY_DTYPE) for col in MONEY_COLUMNS},
+        'minutes_included': plan['minutes_included'],
+        'messages_included': plan['messages_included'],
+        'mb_per_month_included': plan['mb_per_month_included'],
+    })
+    return summary[SUMMARY_COLUMNS]
+
+
+def bill_events(calls, messages, internet, users, plans, plan_history=None):
+    """Construye summary_with_plans directamente desde los eventos crudos."""
+    return rate_usage(aggregate_events(calls, messages, internet), users, plans, plan_history)
+
+
+def measure_billing_throughput(calls, messages, internet, users, plans, repeat=3):
+    """Mide el rendimiento de ``bill_events`` en eventos por segundo (mejor de ``repeat``)."""
+    n_events = len(calls) + len(messages) + len(internet)
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        bill_events(calls, messages, internet, users, plans)
+        best = min(best, time.perf_counter() - start)
+    return {
+        'events': n_events,
+        'seconds': best,
+        'events_per_second': n_events / best if best > 0 else float('inf'),
+    }
+
+
+def cost_under_plans(usage, plans):
+    """Costo mensual de cada fila de ``usage`` bajo cada plan de ``plans``.
+
+    Evalúa todas las filas contra todos los planes a la vez (difusión de NumPy)
+    con ``bill_lines``, en centavos enteros. Devuelve un
+    DataFrame en dólares con una columna por ``plan_name`` y el mismo índice
+    que ``usage``.
+    """
+    plan = {col: plans[col].to_numpy(dtype=float)[None, :] for col in plans.columns if col != 'plan_name'}
+    cents = bill_lines(
+        plan,
+        usage['total_minutes'].to_numpy(dtype=float)[:, None],
+        usage['messages_count'].to_numpy(dtype=float)[:, None],
+        usage['usage_mb'].to_numpy(dtype=float)[:, None],
+    )['total_monthly_cost']
+    return pd.DataFrame(to_dollars(cents), index=usage.index, columns=plans['plan_name'].to_numpy())
+
+
+def plan_parameters(plans):
+    """Parámetros de cada plan como floats de Python: ``{plan_name: {columna: valor}}``.
+
+    Se calculan una vez para que los cálculos escalares (simulador) no filtren
+    ``plans`` en cada interacción.
+    """
+    columns = [c for c in plans.columns if c != 'plan_name']
+    return {
+        row['plan_name']: {c: float(row[c]) for c in columns}
+        for row in plans.to_dict(orient='records')
+    }
+
+
+def monthly_bill(plan, total_minutes, messages_count, usage_mb):
+    """Desglose en centavos de la factura de un mes bajo ``plan`` (un elemento de ``plan_parameters``).
+
+    Usa ``bill_lines`` con escalares: el total de MB se cobra en GB completos
+    y cada concepto se redondea al centavo.
+    """
+    bill = bill_lines(plan, total_minutes, messages_count, usage_mb)
+    return {col: int(bill[col]) for col in ['usd_monthly_pay', 'extra_minute_cost', 'extra_message_cost',
+                                            'extra_mb_cost', 'total_monthly_cost']}
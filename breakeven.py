@@ -0,0 +1,152 @@
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from billing import MB_PER_GB, cost_under_plans, monthly_bill, plan_parameters, to_dollars
+
+# Dimensiones del simulador: columna de uso, columnas del plan, dominio del slider
+# y paso de la rejilla. Los datos se expresan en GB (la columna de uso está en MB)
+USAGE_DIMENSIONS = {
+    'minutes': {
+        'label': 'Minutos de llamadas', 'usage': 'total_minutes', 'to_usage': 1,
+        'included': 'minutes_included', 'included_per_unit': 1, 'rate': 'usd_per_minute',
+        'domain': (0, 5000), 'step': 1,
+    },
+    'messages': {
+        'label': 'Mensajes enviados', 'usage': 'messages_count', 'to_usage': 1,
+        'included': 'messages_included', 'included_per_unit': 1, 'rate': 'usd_per_message',
+        'domain': (0, 1500), 'step': 1,
+    },
+    'gb': {
+        'label': 'Datos utilizados (GB)', 'usage': 'usage_mb', 'to_usage': MB_PER_GB,
+        'included': 'mb_per_month_included', 'included_per_unit': MB_PER_GB, 'rate': 'usd_per_gb',
+        'domain': (0.0, 50.0), 'step': 0.1,
+    },
+}
+
+
+def usage_grid(dimension):
+    """Puntos de la rejilla que recorre todo el dominio del slider de ``dimension``."""
+    spec = USAGE_DIMENSIONS[dimension]
+    low, high = spec['domain']
+    n_points = int(round((high - low) / spec['step'])) + 1
+    return np.linspace(low, high, n_points)
+
+
+def _usage_frame(dimension, values, fixed):
+    # Filas de uso con ``dimension`` variando y las otras dos fijas en ``fixed`` (en unidades del simulador)
+    columns = {}
+    for name, spec in USAGE_DIMENSIONS.items():
+        unit_values = values if name == dimension else np.full(len(values), float(fixed[name]))
+        columns[spec['usage']] = unit_values * spec['to_usage']
+    return pd.DataFrame(columns)
+
+
+def cost_curves(plans, dimension, fixed, grid=None):
+    """Costo de cada plan sobre toda la rejilla de ``dimension`` con las otras dimensiones fijas.
+
+    ``fixed`` trae el valor de cada dimensión (``minutes``, ``messages``, ``gb``).
+    Evalúa toda la rejilla contra todos los planes en una sola llamada a
+    ``cost_under_plans``. Devuelve un DataFrame ancho: la columna ``dimension``
+    y una columna de costo por plan.
+    """
+    grid = usage_grid(dimension) if grid is None else np.asarray(grid, dtype=float)
+    costs = cost_under_plans(_usage_frame(dimension, grid, fixed), plans)
+    costs.insert(0, dimension, grid)
+    return costs
+
+
+def _plan_line(plan, dimension, fixed):
+    # Costo del plan (USD) como K + r·max(0, u − I) en la unidad facturada u de ``dimension``
+    spec = USAGE_DIMENSIONS[dimension]
+    at_zero = dict(fixed, **{dimension: 0})
+    base = to_dollars(monthly_bill(
+        plan,
+        at_zero['minutes'] * USAGE_DIMENSIONS['minutes']['to_usage'],
+        at_zero['messages'] * USAGE_DIMENSIONS['messages']['to_usage'],
+        at_zero['gb'] * USAGE_DIMENSIONS['gb']['to_usage'],
+    )['total_monthly_cost'])
+    return base, plan[spec['rate']], plan[spec['included']] / spec['included_per_unit']
+
+
+def _difference_roots(line_a, line_b, low, high):
+    # Raíces de costo_a(u) − costo_b(u) en [low, high]; la diferencia es lineal entre los
+    # límites incluidos de ambos planes, así que cada tramo se resuelve en forma cerrada
+    (k_a, r_a, i_a), (k_b, r_b, i_b) = line_a, line_b
+
+    def difference(u):
+        return (k_a + r_a * max(0.0, u - i_a)) - (k_b + r_b * max(0.0, u - i_b))
+
+    knots = sorted({low, high, *(i for i in (i_a, i_b) if low < i < high)})
+    roots = []
+    for start, end in zip(knots[:-1], knots[1:]):
+        d_start, d_end = difference(start), difference(end)
+        if d_start == d_end:
+            continue  # tramo paralelo: sin cruce (o empate en todo el tramo)
+        root = start + d_start * (end - start) / (d_start - d_end)
+        if start <= root <= end and (not roots or not np.isclose(roots[-1], root)):
+            roots.append(root)
+    return roots
+
+
+def break_even_points(plans, dimension, fixed):
+    """Umbrales exactos de ``dimension`` donde dos planes cuestan lo mismo.
+
+    El precio de cada plan es lineal por tramos en la unidad facturada (minuto,
+    mensaje o GB completo), con las otras dimensiones fijas en ``fixed``; los
+    cruces se obtienen analíticamente, sin evaluar la rejilla. Para datos el
+    umbral está en GB facturados (el uso se redondea al GB superior). Devuelve
+    una fila por cruce con el plan más barato antes y después del umbral.
+    """
+    params = plan_parameters(plans)
+    low, high = (float(v) for v in USAGE_DIMENSIONS[dimension]['domain'])
+    lines = {name: _plan_line(plan, dimension, fixed) for name, plan in params.items()}
+
+    def cost(name, u):
+        k, r, i = lines[name]
+        return k + r * max(0.0, u - i)
+
+    delta = USAGE_DIMENSIONS[dimension]['step']
+    rows = []
+    for plan_a, plan_b in combinations(params, 2):
+        for root in _difference_roots(lines[plan_a], lines[plan_b], low, high):
+            before = min((plan_a, plan_b), key=lambda p: cost(p, max(low, root - delta)))
+            after = min((plan_a, plan_b), key=lambda p: cost(p, min(high, root + delta)))
+            rows.append({
+                'dimension': dimension,
+                'plan_a': plan_a,
+                'plan_b': plan_b,
+                'threshold': root,
+                'cost': cost(plan_a, root),
+                'cheaper_below': before,
+                'cheaper_above': after,
+            })
+    columns = ['dimension', 'plan_a', 'plan_b', 'threshold', 'cost', 'cheaper_below', 'cheaper_above']
+    return pd.DataFrame(rows, columns=columns).sort_values('threshold', ignore_index=True)
+
+
+def usage_distribution(summary_with_plans, dimension, bins=50):
+    """Distribución de usuarios-mes sobre el dominio de ``dimension``, por plan.
+
+    Cuenta filas de ``summary_with_plans`` en ``bins`` intervalos iguales del
+    dominio del slider (los valores fuera del dominio caen en el último) con
+    ``np.histogram`` por plan. Devuelve ``bin_start``, ``bin_end``, ``plan_name``
+    y ``rows``.
+    """
+    spec = USAGE_DIMENSIONS[dimension]
+    low, high = spec['domain']
+    edges = np.linspace(low, high, bins + 1)
+    values = np.clip(summary_with_plans[spec['usage']].to_numpy(dtype=float) / spec['to_usage'], low, high)
+    plan_names = summary_with_plans['plan_name'].to_numpy()
+
+    frames = []
+    for plan_name in pd.unique(plan_names):
+        counts, _ = np.histogram(values[plan_names == plan_name], bins=edges)
+        frames.append(pd.DataFrame({
+            'bin_start': edges[:-1],
+            'bin_end': edges[1:],
+            'plan_name': plan_name,
+            'rows': counts,
+        }))
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+
+# Claves (user_id, día) y (user_id, mes) empaquetadas en int64 con el formato de billing
+from billing import _PERIOD_BITS
+
+# Métricas diarias y el límite del plan contra el que se acumula cada una
+LIMIT_COLUMNS = {
+    'total_minutes': 'minutes_included',
+    'messages_count': 'messages_included',
+    'usage_mb': 'mb_per_month_included',
+}
+
+
+def _segment_starts(keys):
+    # Primera fila de cada segmento de claves iguales (las claves ya vienen ordenadas)
+    if len(keys) == 0:
+        return np.empty(0, dtype=np.int64)
+    return np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+
+
+def _segmented_cumsum(values, starts, segment_of_row):
+    # Suma acumulada que se reinicia al comienzo de cada segmento
+    cumulative = np.cumsum(values)
+    offsets = np.concatenate([[0], cumulative])[starts]
+    return cumulative - offsets[segment_of_row]
+
+
+def synthesize_daily_usage(summary_with_plans, seed=42):
+    """Reparte los totales mensuales de cada usuario entre los días del mes.
+
+    Sirve cuando sólo hay totales mensuales (datos sintéticos). Los pesos
+    diarios son aleatorios (gamma) y el reparto se hace sobre la suma acumulada
+    redondeada, así que los valores diarios son enteros y suman exactamente el
+    total del mes. Todo es lineal en el número de filas diarias. Devuelve
+    ``user_id``, ``date`` y las métricas de ``LIMIT_COLUMNS``, ordenado por
+    (user_id, date).
+    """
+    order = np.lexsort((summary_with_plans['month'].array.asi8, summary_with_plans['user_id'].to_numpy()))
+    monthly = summary_with_plans.iloc[order]
+    month_start = monthly['month'].dt.start_time.to_numpy().astype('datetime64[D]')
+    days_in_month = monthly['month'].dt.days_in_month.to_numpy()
+
+    n_days = int(days_in_month.sum())
+    row_of_day = np.repeat(np.arange(len(monthly)), days_in_month)
+    starts = np.concatenate([[0], np.cumsum(days_in_month)[:-1]]).astype(np.int64)
+    day_offset = np.arange(n_days) - starts[row_of_day]
+
+    rng = np.random.default_rng(seed)
+    daily = {
+        'user_id': monthly['user_id'].to_numpy()[row_of_day],
+        'date': month_start[row_of_day] + day_offset.astype('timedelta64[D]'),
+    }
+    ends = starts + days_in_month - 1
+    for column in LIMIT_COLUMNS:
+        weights = rng.gamma(2.0, size=n_days)
+        cumulative_weight = _segmented_cumsum(weights, starts, row_of_day)
+        share = cumulative_weight / cumulative_weight[ends][row_of_day]  # el último día vale 1 exacto
+        cumulative = np.rint(share * monthly[column].to_numpy(dtype=float)[row_of_day])
+        daily[column] = np.diff(cumulative, prepend=0.0)
+        daily[column][starts] = cumulative[starts]
+    return pd.DataFrame(daily)
+
+
+def limit_crossings(daily_usage, summary_with_plans):
+    """Día exacto en que cada usuario supera cada límite de su plan dentro del mes.
+
+    Ordena los registros diarios por (user_id, date) si hace falta, acumula cada
+    métrica por (usuario, mes) con una suma acumulada segmentada y toma la
+    primera fila de cada segmento en la que el acumulado supera el límite (el
+    total de MB se compara en MB: superar el límite en MB equivale a facturar
+    un GB extra). Lineal en el número de registros diarios. Devuelve una fila por
+    (usuario, mes, métrica) que cruza el límite, con ``crossing_date`` y
+    ``crossing_day`` (día del mes).
+    """
+    user_ids = daily_usage['user_id'].to_numpy(dtype=np.int64)
+    dates = daily_usage['date'].to_numpy().astype('datetime64[D]')
+    month_ordinals = dates.astype('datetime64[M]').astype(np.int64)
+    day_keys = (user_ids << _PERIOD_BITS) | dates.astype(np.int64)
+    if len(day_keys) > 1 and np.any(day_keys[1:] < day_keys[:-1]):
+        order = np.argsort(day_keys, kind='stable')
+        daily_usage, user_ids, dates, month_ordinals = (
+            daily_usage.iloc[order], user_ids[order], dates[order], month_ordinals[order]
+        )
+
+    month_keys = (user_ids << _PERIOD_BITS) | month_ordinals
+    starts = _segment_starts(month_keys)
+    segment_of_row = np.cumsum(np.r_[False, month_keys[1:] != month_keys[:-1]]) if len(month_keys) else month_keys
+
+    # Límites del plan de cada segmento (usuario, mes) por búsqueda ordenada en el resumen mensual
+    summary_keys = (
+        (summary_with_plans['user_id'].to_numpy(dtype=np.int64) << _PERIOD_BITS)
+        | summary_with_plans['month'].array.asi8
+    )
+    summary_order = np.argsort(summary_keys, kind='stable')
+    position = summary_order[np.searchsorted(summary_keys[summary_order], month_keys[starts])]
+    plan_names = summary_with_plans['plan_name'].to_numpy()[position]
+
+    frames = []
+    for metric, limit_column in LIMIT_COLUMNS.items():
+        cumulative = _segmented_cumsum(daily_usage[metric].to_numpy(dtype=float), starts, segment_of_row)
+        limits = summary_with_plans[limit_column].to_numpy(dtype=float)[position]
+        over = np.flatnonzero(cumulative > limits[segment_of_row])
+        # Las filas sobre el límite vienen ordenadas; la primera de cada segmento es el cruce
+        first = over[_segment_starts(segment_of_row[over])]
+        segment = segment_of_row[first]
+        frames.append(pd.DataFrame({
+            'user_id': user_ids[first],
+            'month': pd.PeriodIndex(dates[first].astype('datetime64[M]'), freq='M'),
+            'plan_name': plan_names[segment],
+            'metric': metric,
+            'limit': limits[segment],
+            'crossing_date': dates[first],
+            'crossing_day': (dates[first] - dates[first].astype('datetime64[M]')).astype(np.int64) + 1,
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def crossing_day_distribution(crossings, months_per_plan):
+    """Usuarios-mes que cruzan cada límite por día del mes y plan.
+
+    ``months_per_plan`` es el número de filas usuario-mes de cada plan; se usa
+    para expresar el cruce acumulado como porcentaje de los usuarios-mes.
+    """
+    counts = (
+        crossings.groupby(['plan_name', 'metric', 'crossing_day']).size()
+        .rename('user_months').reset_index()
+    )
+    counts['cumulative_share'] = (
+        counts.groupby(['plan_name', 'metric'])['user_months'].cumsum()
+        / counts['plan_name'].map(months_per_plan) * 100
+    )
+    return counts
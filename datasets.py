@@ -0,0 +1,213 @@
+import logging
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from aggregates import build_state, refresh_month
+from billing import aggregate_events, bill_events, plan_history_from_users, rate_usage
+from daily import synthesize_daily_usage
+from shared_data import freeze
+from sources import PLAN_HISTORY_TABLES, SOURCE_DIR, load_sources, read_table
+
+logger = logging.getLogger(__name__)
+
+# Número de usuarios sintéticos; se puede escalar para pruebas de carga
+N_USERS = int(os.environ.get('MEGALINE_N_USERS', 500))
+
+
+def generate_synthetic_data(n_users=None):
+    """Genera ``users``, ``plans`` y ``summary_with_plans`` sintéticos (semilla fija)."""
+    # Para demostración, generamos datos sintéticos similares a los del notebook
+    
+    # Planes
+    plans = pd.DataFrame({
+        'plan_name': ['surf', 'ultimate'],
+        'usd_monthly_pay': [20, 70],
+        'minutes_included': [500, 3000],
+        'messages_included': [50, 1000],
+        'mb_per_month_included': [15360, 30720],  # 15GB y 30GB en MB
+        'usd_per_minute': [0.03, 0.01],
+        'usd_per_message': [0.03, 0.01],
+        'usd_per_gb': [10, 7]
+    })
+    
+    # Generar datos sintéticos para usuarios
+    np.random.seed(42)
+    n_users = N_USERS if n_users is None else n_users
+    user_ids = range(1, n_users + 1)
+    plans_list = ['surf', 'ultimate']
+    cities = ['New York', 'Chicago', 'Boston', 'Los Angeles', 'Miami', 'Jersey City', 'San Francisco']
+    
+    users = pd.DataFrame({
+        'user_id': user_ids,
+        'plan': np.random.choice(plans_list, n_users, p=[0.6, 0.4]),  # 60% surf, 40% ultimate
+        'city': np.random.choice(cities, n_users),
+        'churn_date': [pd.NaT if np.random.random() > 0.2 else 
+                      pd.Timestamp('2019-01-01') + pd.Timedelta(days=np.random.randint(0, 180)) 
+                      for _ in range(n_users)]
+    })
+    
+    # Generar datos sintéticos para comportamiento de usuario
+    months = pd.period_range(start='2019-01', end='2019-06', freq='M')
+    
+    # Crear dataframe de resumen
+    data_rows = []
+    for user_id, user_plan, user_churn in users[['user_id', 'plan', 'churn_date']].itertuples(index=False):
+        
+        for month in months:
+            # Verificar si el usuario ya abandonó el servicio
+            if pd.notna(user_churn) and pd.Timestamp(month.start_time) > user_churn:
+                continue
+                
+            # Generar datos sintéticos basados en el plan
+            if user_plan == 'surf':
+                total_minutes = np.random.normal(450, 100)  # Media cercana al límite del plan
+                messages_count = np.random.normal(40, 15)
+                usage_mb = np.random.normal(13000, 4000)
+            else:  # ultimate
+                total_minutes = np.random.normal(1500, 500)
+                messages_count = np.random.normal(400, 200)
+                usage_mb = np.random.normal(25000, 7000)
+            
+            # Asegurar valores no negativos y aplicar el redondeo de facturación:
+            # minutos y MB hacia arriba, mensajes como conteo entero
+            total_minutes = np.ceil(max(0, total_minutes))
+            messages_count = np.round(max(0, messages_count))
+            usage_mb = np.ceil(max(0, usage_mb))
+            
+            data_rows.append({
+                'user_id': user_id,
+                'month': month,
+                'total_minutes': total_minutes,
+                'messages_count': messages_count,
+                'usage_mb': usage_mb,
+            })
+    
+    # Excedentes y costos con las mismas reglas que la facturación desde eventos
+    summary_with_plans = rate_usage(pd.DataFrame(data_rows), users, plans, plan_history_from_users(users))
+    
+    return users, plans, summary_with_plans
+
+
+@lru_cache(maxsize=None)
+def load_source_tables(source_dir=None):
+    """Las cinco tablas de Megaline leídas una vez por proceso (congeladas).
+
+    El rendimiento de lectura por archivo se registra en el logger ``datasets``.
+    """
+    tables, report = load_sources() if source_dir is None else load_sources(source_dir)
+    logger.info("Lectura de los CSV de Megaline:\n%s", report.to_string(index=False))
+    return freeze(tables)
+
+
+def source_plan_history(users, source_dir=None):
+    """Historial de planes de los CSV: ``megaline_plan_history.csv`` si existe.
+
+    Sin ese archivo cada usuario conserva su plan actual desde ``reg_date``.
+    """
+    source_dir = Path(source_dir or SOURCE_DIR)
+    if not (source_dir / PLAN_HISTORY_TABLES['plan_history']['file']).exists():
+        return plan_history_from_users(users)
+    plan_history, _ = read_table('plan_history', source_dir, PLAN_HISTORY_TABLES)
+    return plan_history
+
+
+def load_source_data(source_dir=None):
+    """Lee los CSV de Megaline en paralelo y factura los eventos.
+
+    Cada mes se factura con el plan vigente según ``source_plan_history``.
+    Devuelve ``users``, ``plans`` y ``summary_with_plans`` como
+    ``generate_synthetic_data``.
+    """
+    tables = load_source_tables(source_dir)
+    users = tables['users'].astype({'city': str, 'plan': str})
+    summary_with_plans = bill_events(
+        tables['calls'], tables['messages'], tables['internet'], users, tables['plans'],
+        source_plan_history(users, source_dir),
+    )
+    return users, tables['plans'], summary_with_plans
+
+
+# Capa de datos compartida por el dashboard, la API y el reporte estático: se
+# calcula una vez por proceso y se entrega congelada (sólo lectura). Con
+# MEGALINE_SOURCE_DIR se usan los CSV reales en lugar de los datos sintéticos
+@lru_cache(maxsize=None)
+def load_data():
+    if os.environ.get('MEGALINE_SOURCE_DIR'):
+        return freeze(load_source_data())
+    return freeze(generate_synthetic_data())
+
+
+@lru_cache(maxsize=None)
+def load_plan_history():
+    users, _, _ = load_data()
+    if os.environ.get('MEGALINE_SOURCE_DIR'):
+        return freeze(source_plan_history(users))
+    return freeze(plan_history_from_users(users))
+
+
+@lru_cache(maxsize=None)
+def _initial_state():
+    users, _, summary_with_plans = load_data()
+    return freeze(build_state(users, summary_with_plans))
+
+
+# Estado vigente tras incorporar meses con ``append_month`` (None: el inicial) y la
+# tabla usuario-mes de ese estado, armada una sola vez por versión
+_current_state = None
+_current_summary = (None, None)
+_state_lock = threading.Lock()
+
+
+def load_state():
+    """Agregados mensuales vigentes del proceso (congelados).
+
+    Se construyen una vez desde ``load_data``; ``append_month`` los reemplaza.
+    """
+    state = _current_state
+    return _initial_state() if state is None else state
+
+
+def append_month(month_rows, users_delta=None):
+    """Incorpora (o reemplaza) un mes de filas usuario-mes y reemplaza el estado vigente.
+
+    ``month_rows`` tiene las columnas de ``summary_with_plans`` (dinero en
+    centavos) y un único mes; ``users_delta`` trae ``user_id`` y ``churn_date``
+    de usuarios nuevos o con cambios. Pasa por ``aggregates.refresh_month``,
+    así que el costo es proporcional al mes y no a la historia. Los demás
+    meses conservan su huella: las cachés que usan ``version_for`` de esos
+    meses siguen siendo válidas. Devuelve el estado nuevo.
+    """
+    global _current_state
+    with _state_lock:
+        _current_state = freeze(refresh_month(load_state(), month_rows, users_delta))
+        return _current_state
+
+
+def load_summary():
+    """``summary_with_plans`` vigente: la de ``load_data`` más los meses de ``append_month``."""
+    global _current_summary
+    state = _current_state
+    if state is None:
+        return load_data()[2]
+    with _state_lock:
+        version, summary = _current_summary
+        if version != state.version:
+            summary = freeze(state.summary)
+            _current_summary = (state.version, summary)
+        return summary
+
+
+# Uso diario: con los CSV reales sale de los eventos fechados; con datos
+# sintéticos (sólo totales mensuales) se reparte cada mes entre sus días
+@lru_cache(maxsize=None)
+def load_daily_usage():
+    if os.environ.get('MEGALINE_SOURCE_DIR'):
+        tables = load_source_tables()
+        return freeze(aggregate_events(tables['calls'], tables['messages'], tables['internet'], freq='D'))
+    _, _, summary_with_plans = load_data()
+    return freeze(synthesize_daily_usage(summary_with_plans))
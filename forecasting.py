@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from billing import to_dollars
+
+# Rejilla de parámetros de suavizado evaluada para todas las series a la vez
+ALPHA_GRID = np.linspace(0.05, 0.95, 19)
+BETA_GRID = np.linspace(0.0, 0.9, 10)
+
+
+def revenue_series(state, by=('plan_name', 'city')):
+    """Matrices serie × mes de ingreso total y ARPU a partir del cubo de agregados."""
+    keys = list(by) + ['month']
+    grouped = state.cube.groupby(level=keys, observed=True)[['total_monthly_cost_sum', 'rows']].sum()
+    revenue = to_dollars(grouped['total_monthly_cost_sum'].unstack('month'))
+    users = grouped['rows'].unstack('month')
+    revenue = revenue.reindex(columns=sorted(revenue.columns))
+    users = users.reindex(index=revenue.index, columns=revenue.columns)
+    return {
+        'revenue': revenue.fillna(0),
+        'arpu': (revenue / users).T.ffill().bfill().T,
+    }
+
+
+def fit_holt(values, trend=True, alphas=ALPHA_GRID, betas=BETA_GRID):
+    """Ajusta suavizado exponencial (Holt si ``trend``) a cada fila de ``values``.
+
+    Todas las series y todas las combinaciones de la rejilla avanzan juntas en
+    una sola recursión sobre el tiempo (arreglos serie × rejilla); para cada
+    serie se elige la combinación con menor error cuadrático a un paso.
+    """
+    values = np.asarray(values, dtype=float)
+    n_series, n_months = values.shape
+    if not trend:
+        betas = np.array([0.0])
+    alpha, beta = (g.ravel() for g in np.meshgrid(alphas, betas, indexing='ij'))
+
+    level = np.repeat(values[:, :1], len(alpha), axis=1)
+    initial_trend = values[:, 1:2] - values[:, :1] if (trend and n_months > 1) else np.zeros((n_series, 1))
+    slope = np.repeat(initial_trend, len(alpha), axis=1)
+    sse = np.zeros((n_series, len(alpha)))
+
+    for t in range(1, n_months):
+        prediction = level + slope
+        error = values[:, t:t + 1] - prediction
+        sse += error ** 2
+        level = prediction + alpha * error
+        slope = slope + alpha * beta * error
+
+    best = sse.argmin(axis=1)
+    rows = np.arange(n_series)
+    n_errors = max(n_months - (2 if trend else 1), 1)
+    return {
+        'alpha': alpha[best],
+        'beta': beta[best],
+        'level': level[rows, best],
+        'slope': slope[rows, best],
+        'sigma2': sse[rows, best] / n_errors,
+    }
+
+
+def forecast_holt(fit, horizon=3, confidence=0.95):
+    """Pronóstico a ``horizon`` meses con intervalos de predicción del modelo ETS(A,A,N)."""
+    h = np.arange(1, horizon + 1)[None, :]
+    alpha = fit['alpha'][:, None]
+    beta = (fit['alpha'] * fit['beta'])[:, None]
+    mean = fit['level'][:, None] + h * fit['slope'][:, None]
+    variance = fit['sigma2'][:, None] * (1 + (h - 1) * (alpha ** 2 + alpha * beta * h + beta ** 2 * h * (2 * h - 1) / 6))
+    half_width = stats.norm.ppf(0.5 + confidence / 2) * np.sqrt(variance)
+    return mean, mean - half_width, mean + half_width
+
+
+def forecast_revenue(state, horizon=3, trend=True, confidence=0.95):
+    """Pronóstico de ingreso total y ARPU para cada (plan, ciudad) en formato largo."""
+    frames = []
+    for metric, series in revenue_series(state).items():
+        months = series.columns
+        fit = fit_holt(series.to_numpy(), trend=trend)
+        mean, lower, upper = forecast_holt(fit, horizon, confidence)
+        future = pd.period_range(months[-1] + 1, periods=horizon, freq='M')
+
+        history = series.stack().rename('value').reset_index()
+        history['kind'] = 'histórico'
+        forecast = pd.DataFrame({
+            'plan_name': np.repeat(series.index.get_level_values('plan_name'), horizon),
+            'city': np.repeat(series.index.get_level_values('city'), horizon),
+            'month': np.tile(future, len(series)),
+            'value': mean.ravel(),
+            'lower': lower.ravel(),
+            'upper': upper.ravel(),
+            'kind': 'pronóstico',
+        })
+        frames.append(pd.concat([history, forecast], ignore_index=True).assign(metric=metric))
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,34 @@
+from scipy import stats
+
+from billing import to_dollars
+
+# Ciudades que forman la región NY-NJ
+NY_NJ_PATTERN = 'New York|Jersey'
+
+
+def plan_revenue_groups(summary_with_plans):
+    """Ingresos mensuales (USD) de los planes Ultimate y Surf, en ese orden."""
+    income = to_dollars(summary_with_plans['total_monthly_cost'])
+    ultimate_income = income[summary_with_plans['plan_name'] == 'ultimate']
+    surf_income = income[summary_with_plans['plan_name'] == 'surf']
+    return ultimate_income, surf_income
+
+
+def region_revenue_groups(summary_with_plans):
+    """Ingresos mensuales (USD) de la región NY-NJ y del resto de regiones, en ese orden."""
+    in_region = summary_with_plans['city'].str.contains(NY_NJ_PATTERN, case=False, na=False)
+    income = to_dollars(summary_with_plans['total_monthly_cost'])
+    return income[in_region], income[~in_region]
+
+
+def welch_test(sample_a, sample_b, alpha=0.05):
+    """Prueba t de Welch (varianzas distintas) entre dos muestras de ingresos."""
+    t_stat, p_value = stats.ttest_ind(sample_a, sample_b, equal_var=False)
+    return {
+        'mean_a': float(sample_a.mean()),
+        'mean_b': float(sample_b.mean()),
+        't_stat': float(t_stat),
+        'p_value': float(p_value),
+        'alpha': alpha,
+        'reject_null': bool(p_value < alpha),
+    }
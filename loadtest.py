@@ -0,0 +1,237 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import queue
+import time
+
+import numpy as np
+import pandas as pd
+
+import datasets
+from shared_data import measure_session_memory
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+
+# Selectores de visualización por pestaña: clave del widget → opciones (el de Llamadas no tiene clave)
+CHART_RADIOS = {
+    None: ["Duración Promedio por Mes", "Distribución de Minutos", "Comparativa de Planes"],
+    'msg_radio': ["Promedio por Mes", "Distribución de Mensajes", "Comparativa de Planes"],
+    'net_radio': ["Promedio por Mes", "Distribución de Uso", "Comparativa de Planes"],
+}
+
+# Sliders del simulador de escenarios y su rango
+SIMULATOR_SLIDERS = {
+    "Minutos de llamadas": (0, 5000),
+    "Mensajes enviados": (0, 1500),
+    "Datos utilizados (GB)": (0.0, 50.0),
+}
+
+
+def _find(widgets, matches, description):
+    # Primer widget que cumple ``matches``; si la app ya no lo tiene, el error lo nombra
+    for widget in widgets:
+        if matches(widget):
+            return widget
+    raise RuntimeError(f"La app no tiene el widget {description}")
+
+
+def _radio(at, key):
+    if key is not None:
+        return _find(at.radio, lambda r: r.key == key, f"radio key={key!r}")
+    return _find(at.radio, lambda r: r.key is None and r.options == CHART_RADIOS[None], "radio de Llamadas")
+
+
+def _slider(at, label):
+    return _find(at.slider, lambda s: s.label == label, f"slider {label!r}")
+
+
+def _interact(at, rng):
+    # Una interacción de usuario: cambiar un selector de gráfico o mover un slider del simulador.
+    # Las pestañas de Streamlit se renderizan todas en cada rerun, así que "cambiar de
+    # pestaña" no genera trabajo en el servidor; lo que dispara reruns son los widgets.
+    if rng.random() < 0.5:
+        key = list(CHART_RADIOS)[rng.integers(len(CHART_RADIOS))]
+        _radio(at, key).set_value(CHART_RADIOS[key][rng.integers(3)])
+    else:
+        label = list(SIMULATOR_SLIDERS)[rng.integers(len(SIMULATOR_SLIDERS))]
+        low, high = SIMULATOR_SLIDERS[label]
+        value = round(float(rng.uniform(low, high)), 1) if isinstance(low, float) else int(rng.integers(low, high + 1))
+        _slider(at, label).set_value(value)
+
+
+def run_session(interactions=5, seed=0, timeout=300):
+    """Simula una sesión: carga inicial y ``interactions`` cambios de widget.
+
+    Devuelve la latencia (segundos) de cada rerun del script, empezando por la carga inicial.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    rng = np.random.default_rng(seed)
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    latencies = []
+
+    start = time.perf_counter()
+    at.run()
+    latencies.append(time.perf_counter() - start)
+    if at.exception:
+        raise RuntimeError(f"La sesión {seed} falló: {at.exception[0].value}")
+
+    for _ in range(interactions):
+        _interact(at, rng)
+        start = time.perf_counter()
+        at.run()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def _rendered_session(timeout=300):
+    # Una sesión ya renderizada: lo que queda vivo mientras el usuario mira el tablero
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    at.run()
+    return at
+
+
+def session_memory(sessions, timeout=300):
+    """Memoria adicional por sesión manteniendo vivas ``sessions`` sesiones ya renderizadas.
+
+    Una primera sesión, que no se mide, llena las cachés compartidas; después
+    se mide sólo lo que agrega cada sesión (``shared_data.measure_session_memory``),
+    así que con datos compartidos el valor no depende de ``sessions``.
+    """
+    # Tras el primer rerun Streamlit recorre en segundo plano los manifiestos de los
+    # paquetes instalados (una vez por proceso); la segunda sesión de calentamiento
+    # evita que esa memoria caiga dentro de la medición
+    report = measure_session_memory(lambda: _rendered_session(timeout), sessions=(sessions,), warmup=2)
+    return report['bytes_per_session'].iloc[0]
+
+
+def _session_worker(n_users, interactions, seed, timeout, barrier, results):
+    # Proceso de una sesión: calienta sus cachés, espera a las demás y mide sus reruns
+    try:
+        logging.getLogger('streamlit').setLevel(logging.ERROR)
+        datasets.N_USERS = n_users
+        run_session(interactions=0, timeout=timeout)
+        barrier.wait(timeout)
+        start = time.time()
+        latencies = run_session(interactions, seed, timeout)
+        results.put((seed, latencies, start, time.time(), None))
+    except Exception as e:
+        barrier.abort()
+        results.put((seed, None, None, None, f"{type(e).__name__}: {e}"))
+
+
+def run_concurrent_sessions(n_sessions, n_users=500, interactions=5, timeout=300):
+    """Ejecuta ``n_sessions`` sesiones a la vez, cada una en su propio proceso.
+
+    ``AppTest`` no es seguro entre hilos cuando la app usa fragmentos, y con
+    hilos el GIL serializa los reruns: la latencia mediría la contención del
+    GIL y no la concurrencia del servidor. Cada proceso calienta sus propias
+    cachés (como un proceso de servidor) antes de una barrera, así que sólo se
+    mide el tramo en que todas las sesiones corren juntas. Devuelve la
+    latencia de cada rerun por sesión y el tiempo de pared de ese tramo.
+    """
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(n_sessions)
+    results = context.Queue()
+    workers = [
+        context.Process(target=_session_worker, args=(n_users, interactions, seed, timeout, barrier, results))
+        for seed in range(n_sessions)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        outcomes = [results.get(timeout=timeout * (interactions + 2)) for _ in workers]
+    except queue.Empty:
+        raise RuntimeError(f"Las sesiones no terminaron en {timeout * (interactions + 2)} s") from None
+    finally:
+        for worker in workers:
+            worker.join(timeout)
+            if worker.is_alive():
+                worker.terminate()
+
+    errors = [f"sesión {seed}: {error}" for seed, _, _, _, error in outcomes if error is not None]
+    if errors:
+        raise RuntimeError("Fallaron sesiones de la prueba de carga: " + "; ".join(sorted(errors)))
+    per_session = [latencies for _, latencies, _, _, _ in sorted(outcomes, key=lambda o: o[0])]
+    elapsed = max(o[3] for o in outcomes) - min(o[2] for o in outcomes)
+    return per_session, elapsed
+
+
+def _memory_worker(n_users, sessions, timeout, results):
+    # Proceso aparte para la memoria: AppTest reemplaza ``sys.modules['__main__']`` y,
+    # si corriera en el proceso principal, los siguientes procesos no se podrían lanzar
+    try:
+        logging.getLogger('streamlit').setLevel(logging.ERROR)
+        datasets.N_USERS = n_users
+        results.put((session_memory(sessions, timeout), None))
+    except Exception as e:
+        results.put((None, f"{type(e).__name__}: {e}"))
+
+
+def isolated_session_memory(sessions, n_users=500, timeout=300):
+    """Memoria adicional por sesión (``session_memory``) medida en un proceso propio."""
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    worker = context.Process(target=_memory_worker, args=(n_users, sessions, timeout, results))
+    worker.start()
+    try:
+        bytes_per_session, error = results.get(timeout=timeout * (sessions + 3))
+    except queue.Empty:
+        raise RuntimeError(f"La medición de memoria no terminó en {timeout * (sessions + 3)} s") from None
+    finally:
+        worker.join(timeout)
+        if worker.is_alive():
+            worker.terminate()
+    if error is not None:
+        raise RuntimeError(f"Falló la medición de memoria: {error}")
+    return bytes_per_session
+
+
+def load_test(sessions=(1, 5, 10), user_counts=(500,), interactions=5, measure_memory=True, timeout=300):
+    """Ejecuta ``sessions`` sesiones concurrentes por cada tamaño de datos.
+
+    Cada sesión corre en su propio proceso (``run_concurrent_sessions``), así
+    que las latencias reflejan cuántos reruns puede atender la máquina en
+    paralelo. Devuelve un DataFrame con percentiles de latencia por rerun,
+    reruns por segundo y memoria adicional por sesión (medida en otro proceso
+    con las cachés ya llenas y compartidas entre sesiones, como en un servidor
+    Streamlit).
+    """
+    results = []
+    for n_users in user_counts:
+        for n_sessions in sessions:
+            per_session, elapsed = run_concurrent_sessions(n_sessions, n_users, interactions, timeout)
+            latencies = np.concatenate(per_session) * 1000
+            results.append({
+                'n_users': n_users,
+                'sessions': n_sessions,
+                'reruns': len(latencies),
+                'p50_ms': np.percentile(latencies, 50),
+                'p95_ms': np.percentile(latencies, 95),
+                'p99_ms': np.percentile(latencies, 99),
+                'reruns_per_second': len(latencies) / elapsed,
+                'bytes_per_session': isolated_session_memory(n_sessions, n_users, timeout) if measure_memory else np.nan,
+            })
+    return pd.DataFrame(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga local del dashboard Megaline con sesiones simuladas")
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 5, 10])
+    parser.add_argument('--users', type=int, nargs='+', default=[500])
+    parser.add_argument('--interactions', type=int, default=5)
+    parser.add_argument('--no-memory', action='store_true', help="Omitir la medición de memoria por sesión")
+    args = parser.parse_args()
+
+    # Los avisos de Streamlit se repetirían en cada rerun de cada sesión
+    logging.getLogger('streamlit').setLevel(logging.ERROR)
+    report = load_test(args.sessions, args.users, args.interactions, measure_memory=not args.no_memory)
+    with pd.option_context('display.float_format', '{:,.1f}'.format, 'display.width', 120):
+        print(report.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
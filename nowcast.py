@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from billing import rate_usage, resolve_plans
+from daily import LIMIT_COLUMNS
+
+# Métricas proyectadas a fin de mes
+NOWCAST_METRICS = list(LIMIT_COLUMNS)
+
+# Días transcurridos en los que la tasa del mes en curso pesa lo mismo que la histórica
+HISTORY_WEIGHT_DAYS = 15
+
+
+def partial_month_usage(daily_usage, as_of):
+    """Uso acumulado por usuario desde el inicio del mes de ``as_of`` hasta ese día inclusive."""
+    as_of = pd.Timestamp(as_of).normalize()
+    dates = daily_usage['date'].to_numpy()
+    in_window = (dates >= np.datetime64(as_of.replace(day=1))) & (dates <= np.datetime64(as_of))
+    return daily_usage.loc[in_window].groupby('user_id')[NOWCAST_METRICS].sum()
+
+
+def _history_rates(summary_with_plans, month):
+    # Media y desviación estándar mensual de cada usuario en los meses anteriores a ``month``
+    prior = summary_with_plans[summary_with_plans['month'] < month]
+    grouped = prior.groupby('user_id')[NOWCAST_METRICS]
+    return grouped.mean(), grouped.std(), grouped.size()
+
+
+def nowcast_bills(daily_usage, summary_with_plans, users, plans, as_of, plan_history=None):
+    """Proyecta a fin de mes el uso y la factura de cada suscriptor activo.
+
+    Para cada métrica, lo que falta del mes se estima combinando la tasa diaria
+    del mes en curso con la media histórica del usuario (la tasa del mes gana
+    peso a medida que avanza el mes). La incertidumbre del resto del mes sale
+    de la desviación histórica del usuario (o la del plan si hay menos de dos
+    meses) y da la probabilidad de superar cada límite con una aproximación
+    normal. La factura proyectada se calcula con ``rate_usage`` (con el plan
+    vigente en el mes según ``plan_history``, si se da). Todo se hace en lote
+    sobre arreglos alineados por usuario.
+    """
+    as_of = pd.Timestamp(as_of).normalize()
+    month = as_of.to_period('M')
+    elapsed = as_of.day
+    remaining_fraction = (as_of.days_in_month - elapsed) / as_of.days_in_month
+
+    # Suscriptores activos: sin abandono antes del día de corte
+    active = users[users['churn_date'].isna() | (users['churn_date'] > as_of)]
+    active_ids = active['user_id'].to_numpy()
+    partial = partial_month_usage(daily_usage, as_of).reindex(active_ids, fill_value=0)
+
+    history_mean, history_std, history_months = _history_rates(summary_with_plans, month)
+    history_mean = history_mean.reindex(active_ids)
+    history_std = history_std.reindex(active_ids)
+    history_months = history_months.reindex(active_ids, fill_value=0).to_numpy()
+
+    # Dispersión de respaldo: desviación de los usuarios-mes del mismo plan
+    plan_std = summary_with_plans.groupby('plan_name')[NOWCAST_METRICS].std()
+    if plan_history is None:
+        plan_of_user = active['plan'].to_numpy()
+    else:
+        plan_of_user = resolve_plans(active_ids, np.full(len(active_ids), month.ordinal), plan_history)
+
+    # Peso de la tasa del mes en curso frente a la histórica
+    current_weight = np.where(history_months > 0, elapsed / (elapsed + HISTORY_WEIGHT_DAYS), 1.0)
+
+    projected = {}
+    probabilities = {}
+    plan_limits = plans.set_index('plan_name')
+    for metric in NOWCAST_METRICS:
+        so_far = partial[metric].to_numpy(dtype=float)
+        current_remaining = so_far / elapsed * (as_of.days_in_month - elapsed)
+        history_remaining = np.nan_to_num(history_mean[metric].to_numpy(dtype=float)) * remaining_fraction
+        remaining = current_weight * current_remaining + (1 - current_weight) * history_remaining
+        total = so_far + remaining
+
+        spread = history_std[metric].to_numpy(dtype=float)
+        fallback = plan_std[metric].reindex(plan_of_user).to_numpy(dtype=float)
+        spread = np.where((history_months >= 2) & np.isfinite(spread), spread, fallback)
+        remaining_sd = spread * np.sqrt(remaining_fraction)
+
+        limit = plan_limits[LIMIT_COLUMNS[metric]].reindex(plan_of_user).to_numpy(dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            probability = stats.norm.sf((limit - total) / remaining_sd)
+        # Sin incertidumbre restante (fin de mes) la probabilidad es 0 o 1; si el uso
+        # acumulado ya superó el límite, el excedente es seguro
+        probability = np.where(remaining_sd > 0, probability, (total > limit).astype(float))
+        probability = np.where(so_far > limit, 1.0, probability)
+
+        projected[metric] = total
+        probabilities[metric] = probability
+
+    # Factura proyectada con las reglas de facturación (minutos y MB al entero superior)
+    projected_usage = pd.DataFrame({
+        'user_id': active_ids,
+        'month': pd.PeriodIndex.from_ordinals(np.full(len(active_ids), month.ordinal), freq='M'),
+        'total_minutes': np.ceil(projected['total_minutes']),
+        'messages_count': np.round(projected['messages_count']),
+        'usage_mb': np.ceil(projected['usage_mb']),
+    })
+    bills = rate_usage(projected_usage, users, plans, plan_history)
+
+    any_overage = 1 - np.prod([1 - probabilities[m] for m in NOWCAST_METRICS], axis=0)
+    result = bills[['user_id', 'month', 'plan_name', 'city']].assign(
+        days_elapsed=elapsed,
+        history_months=history_months,
+        **{f'{m}_so_far': partial[m].to_numpy(dtype=float) for m in NOWCAST_METRICS},
+        **{f'{m}_projected': bills[m].to_numpy() for m in NOWCAST_METRICS},
+        **{f'{m}_overage_probability': probabilities[m] for m in NOWCAST_METRICS},
+        overage_probability=any_overage,
+        projected_extra_cost=(bills['total_monthly_cost'] - bills['usd_monthly_pay']).to_numpy(),
+        projected_monthly_cost=bills['total_monthly_cost'].to_numpy(),
+    )
+    return result
+
+
+def rank_at_risk(nowcast, min_probability=0.5, top=None):
+    """Suscriptores con probabilidad de excedente de al menos ``min_probability``.
+
+    Ordena por probabilidad y, a igualdad, por el excedente proyectado (centavos).
+    """
+    at_risk = nowcast[nowcast['overage_probability'] >= min_probability]
+    at_risk = at_risk.sort_values(['overage_probability', 'projected_extra_cost'], ascending=False, kind='stable')
+    return at_risk if top is None else at_risk.head(top)
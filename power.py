@@ -0,0 +1,133 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from billing import CENTS_PER_DOLLAR
+
+# Suscriptores por grupo que se evalúan por defecto
+SAMPLE_SIZES = (25, 50, 100, 200, 400, 800, 1600)
+
+# Experimentos simulados por tamaño de muestra
+N_SIMULATIONS = 2000
+
+# Diferencias de medias (centavos) por debajo de esto se consideran nulas
+_ZERO_DIFFERENCE = 1e-9
+
+# Tope de sorteos (suscriptor × mes) por lote para acotar la memoria
+_BATCH_DRAWS = 4_000_000
+
+
+def subscriber_histories(summary_with_plans, plan_name):
+    """Facturas mensuales (centavos) de los suscriptores de ``plan_name``, contiguas por usuario.
+
+    Devuelve ``(values, starts, counts)``: las facturas ordenadas por usuario,
+    la posición de la primera factura de cada usuario y cuántas tiene.
+    """
+    rows = summary_with_plans[summary_with_plans['plan_name'] == plan_name]
+    user_ids = rows['user_id'].to_numpy()
+    order = np.argsort(user_ids, kind='stable')
+    _, starts, counts = np.unique(user_ids[order], return_index=True, return_counts=True)
+    values = rows['total_monthly_cost'].to_numpy(dtype=np.int64)[order]
+    return values, starts, counts
+
+
+def _arm_statistics(rng, histories, n_experiments, n_subscribers, months):
+    # Media y varianza de un grupo por experimento: cada suscriptor se remuestrea
+    # completo y sus ``months`` facturas salen de su propio historial
+    values, starts, counts = histories
+    users = rng.integers(0, len(starts), size=(n_experiments, n_subscribers))
+    offsets = (rng.random((n_experiments, n_subscribers, months)) * counts[users][..., None]).astype(np.int64)
+    per_subscriber = values[starts[users][..., None] + offsets].mean(axis=2)
+    return per_subscriber.mean(axis=1), per_subscriber.var(axis=1, ddof=1)
+
+
+def _simulate_size(histories, n_subscribers, months, n_simulations, seed):
+    # Experimentos de un tamaño de muestra en lotes de arreglos (n_experimentos × n × meses)
+    rng = np.random.default_rng(seed)
+    batch = max(1, _BATCH_DRAWS // (n_subscribers * months))
+    frames = []
+    for start in range(0, n_simulations, batch):
+        size = min(batch, n_simulations - start)
+        mean_a, var_a = _arm_statistics(rng, histories, size, n_subscribers, months)
+        mean_b, var_b = _arm_statistics(rng, histories, size, n_subscribers, months)
+        se_a, se_b = var_a / n_subscribers, var_b / n_subscribers
+        # Si todas las facturas sorteadas son iguales el error estándar es 0 y los
+        # grados de libertad quedan indefinidos (NaN); ``power_curves`` los trata aparte
+        with np.errstate(invalid='ignore', divide='ignore'):
+            df = (se_a + se_b) ** 2 / ((se_a ** 2 + se_b ** 2) / (n_subscribers - 1))
+        frames.append(pd.DataFrame({
+            'sample_size': n_subscribers,
+            'difference': mean_b - mean_a,
+            'std_error': np.sqrt(se_a + se_b),
+            'df': df,
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def simulate_experiments(summary_with_plans, plan_name, sample_sizes=SAMPLE_SIZES, months=3,
+                         n_simulations=N_SIMULATIONS, seed=42, processes=None):
+    """Simula experimentos A/A sobre la distribución empírica de ingresos de ``plan_name``.
+
+    Cada experimento sortea dos grupos de ``n`` suscriptores (con reemplazo) y
+    ``months`` facturas por suscriptor de su propio historial, así que conserva
+    la correlación entre meses de un mismo usuario. Por experimento guarda la
+    diferencia de medias (centavos), su error estándar y los grados de libertad
+    de Welch. Como el efecto de un cambio de precio se modela como un
+    desplazamiento del grupo tratado, la potencia para cualquier efecto y α se
+    obtiene después con ``power_curves`` sin volver a simular. Con
+    ``processes`` los tamaños de muestra se reparten entre procesos; cada tamaño
+    tiene su propia semilla, así que el resultado no depende del reparto.
+    """
+    histories = subscriber_histories(summary_with_plans, plan_name)
+    seeds = np.random.SeedSequence(seed).spawn(len(sample_sizes))
+    jobs = [(histories, int(n), months, n_simulations, s) for n, s in zip(sample_sizes, seeds)]
+    if processes:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            frames = list(pool.map(_simulate_size, *zip(*jobs)))
+    else:
+        frames = [_simulate_size(*job) for job in jobs]
+    return pd.concat(frames, ignore_index=True)
+
+
+def power_curves(simulation, effects, alpha=0.05):
+    """Potencia de la prueba t de Welch bilateral por tamaño de muestra y efecto.
+
+    ``effects`` son diferencias de ingreso mensual por suscriptor en USD. Se
+    evalúan todos los experimentos simulados contra todos los efectos en una
+    sola operación vectorizada. Los experimentos sin varianza (todas las
+    facturas iguales) no tienen prueba t definida: rechazan si la diferencia
+    desplazada no es nula. Devuelve ``sample_size``, ``effect``, ``power`` y
+    ``power_se`` (error de Monte Carlo).
+    """
+    effects = np.atleast_1d(np.asarray(effects, dtype=float))
+    shifted = simulation['difference'].to_numpy()[:, None] + effects * CENTS_PER_DOLLAR
+    std_error = simulation['std_error'].to_numpy()[:, None]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        p_value = 2 * stats.t.sf(np.abs(shifted / std_error), simulation['df'].to_numpy()[:, None])
+    # Sin varianza (todas las facturas iguales) cualquier diferencia no nula se detecta
+    degenerate = std_error == 0
+    rejected = np.where(degenerate, np.abs(shifted) > _ZERO_DIFFERENCE, p_value < alpha)
+    rejected = pd.DataFrame(rejected, columns=effects)
+    rejected['sample_size'] = simulation['sample_size'].to_numpy()
+
+    curves = rejected.groupby('sample_size').mean().rename_axis(columns='effect').stack().rename('power').reset_index()
+    n_simulations = simulation.groupby('sample_size').size()
+    curves['power_se'] = np.sqrt(curves['power'] * (1 - curves['power']) / curves['sample_size'].map(n_simulations))
+    return curves[['sample_size', 'effect', 'power', 'power_se']]
+
+
+def required_sample_sizes(curves, target_power=0.8, months=None):
+    """Menor tamaño de muestra por grupo que alcanza ``target_power`` para cada efecto.
+
+    Queda vacío si ningún tamaño simulado lo alcanza. Con ``months`` agrega
+    el total de usuarios-mes del experimento (ambos grupos).
+    """
+    reached = curves[curves['power'] >= target_power]
+    required = reached.groupby('effect')['sample_size'].min()
+    table = required.reindex(pd.unique(curves['effect'])).rename('sample_size').rename_axis('effect').reset_index()
+    table['sample_size'] = table['sample_size'].astype('Int64')
+    if months is not None:
+        table['user_months'] = table['sample_size'] * 2 * months
+    return table
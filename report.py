@@ -0,0 +1,328 @@
+import argparse
+import html
+import json
+import shutil
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
+from plotly.offline import get_plotlyjs
+
+import api
+import datasets
+from aggregates import COST_BIN_EDGES, monthly_stat
+from forecasting import forecast_revenue
+from power import power_curves, required_sample_sizes, simulate_experiments
+from storage import VERSION_FILE, stored_version
+
+# Directorio por defecto del reporte estático
+REPORT_DIR = Path(__file__).resolve().parent / 'data' / 'report'
+
+PLAN_COLORS = {'surf': '#1E88E5', 'ultimate': '#43A047'}
+
+# Vista por defecto del análisis de potencia en la pestaña de pruebas
+POWER_DEFAULTS = {'plan_name': 'surf', 'months': 3, 'alpha': 0.05, 'target_power': 0.8, 'effects': [1.0, 2.0, 5.0, 10.0]}
+
+# Medias mensuales por plan de las pestañas de uso: (columna, título, eje y, divisor)
+USAGE_VIEWS = {
+    'calls': ('total_minutes', 'Duración Promedio de Llamadas por Plan y Mes', 'Minutos Promedio', 1),
+    'messages': ('messages_count', 'Mensajes Promedio por Plan y Mes', 'Mensajes Promedio', 1),
+    'internet': ('usage_mb', 'Uso Promedio de Datos por Plan y Mes', 'GB Promedio', 1024),
+}
+
+
+def _figure(fig):
+    # Figura de Plotly como dict JSON (los arreglos de numpy quedan como listas)
+    return json.loads(pio.to_json(fig, validate=False))
+
+
+def _plan_figures(users):
+    plan_counts = users['plan'].value_counts()
+    city_counts = users['city'].value_counts().rename_axis('city').reset_index(name='count')
+    return {
+        'plan_distribution': px.pie(
+            names=plan_counts.index, values=plan_counts.values, title="Distribución de Usuarios por Plan",
+            color=plan_counts.index, color_discrete_map=PLAN_COLORS,
+        ),
+        'city_distribution': px.bar(city_counts, x='city', y='count', title="Número de Usuarios por Ciudad", color='city'),
+    }
+
+
+def _usage_figures(state):
+    figures = {}
+    for name, (column, title, y_label, divisor) in USAGE_VIEWS.items():
+        averages = monthly_stat(state, column)
+        averages[column] = averages[column] / divisor
+        averages['month'] = averages['month'].astype(str)
+        figures[name] = px.bar(
+            averages, x='month', y=column, color='plan_name', barmode='group', title=title,
+            labels={'month': 'Mes', column: y_label, 'plan_name': 'Plan'}, color_discrete_map=PLAN_COLORS,
+        )
+    return figures
+
+
+def _income_figures(state):
+    monthly_income = monthly_stat(state, 'total_monthly_cost', stat='sum')
+    monthly_income['month'] = monthly_income['month'].astype(str)
+    figures = {
+        'income_by_month': px.line(
+            monthly_income, x='month', y='total_monthly_cost', color='plan_name', markers=True,
+            title='Evolución de Ingresos Totales por Plan',
+            labels={'month': 'Mes', 'total_monthly_cost': 'Ingreso Total ($)', 'plan_name': 'Plan'},
+            color_discrete_map=PLAN_COLORS,
+        ),
+    }
+
+    # Histograma de ingresos desde los conteos por bin ya acumulados en el estado
+    counts = state.cost_histogram.groupby(level='plan_name').sum()
+    fig = go.Figure()
+    for plan_name, plan_counts in counts.iterrows():
+        fig.add_trace(go.Bar(
+            x=(COST_BIN_EDGES[:-1] + COST_BIN_EDGES[1:]) / 2, y=plan_counts.to_numpy(),
+            width=COST_BIN_EDGES[1:] - COST_BIN_EDGES[:-1], name=plan_name.capitalize(),
+            marker_color=PLAN_COLORS.get(plan_name), opacity=0.75,
+        ))
+    fig.update_layout(
+        title='Distribución de Ingresos por Plan', xaxis_title='Ingreso Mensual ($)',
+        yaxis_title='Frecuencia', barmode='overlay',
+    )
+    figures['income_distribution'] = fig
+    return figures
+
+
+def _power_figure(curves, alpha, target_power):
+    fig = go.Figure()
+    for effect, effect_rows in curves.groupby('effect'):
+        fig.add_trace(go.Scatter(
+            x=effect_rows['sample_size'], y=effect_rows['power'], mode='lines+markers', name=f"${effect:.2f}",
+        ))
+    fig.add_hline(y=target_power, line_dash='dash', line_color='gray')
+    fig.add_hline(y=alpha, line_dash='dot', line_color='red')
+    fig.update_layout(
+        title=f"Curvas de potencia (α = {alpha})", xaxis_title='Suscriptores por grupo', yaxis_title='Potencia',
+        xaxis_type='log', yaxis_range=[0, 1.02], legend_title='Diferencia',
+    )
+    return fig
+
+
+def compute_report():
+    """Ejecuta una vez las vistas por defecto del dashboard y devuelve el contenido del reporte.
+
+    Todo sale de la capa de datos compartida: KPIs y tablas de la API, figuras
+    de Plotly construidas sobre agregados (cubo e histogramas), pruebas de
+    hipótesis, pronóstico del próximo mes y el análisis de potencia por defecto.
+    """
+    users, _, _ = datasets.load_data()
+    summary_with_plans = datasets.load_summary()
+    state = datasets.load_state()
+
+    power = POWER_DEFAULTS
+    simulation = simulate_experiments(summary_with_plans, power['plan_name'], months=power['months'])
+    curves = power_curves(simulation, power['effects'], power['alpha'])
+    forecasts = forecast_revenue(state, horizon=3)
+    next_month = forecasts[forecasts['kind'] == 'pronóstico'].groupby(['metric', 'plan_name', 'city']).head(1)
+
+    figures = {
+        **_plan_figures(users),
+        **_usage_figures(state),
+        **_income_figures(state),
+        'power_curves': _power_figure(curves, power['alpha'], power['target_power']),
+    }
+    return {
+        'version': state.version,
+        'built_at': pd.Timestamp.now(tz='UTC').isoformat(timespec='seconds'),
+        'kpis': api.ROUTES['/api/kpis']({}),
+        'plans': api.ROUTES['/api/plans']({}),
+        'revenue_by_plan': api.ROUTES['/api/revenue/by-plan']({}),
+        'revenue_by_month': api.ROUTES['/api/revenue/by-month']({}),
+        'tests': api.ROUTES['/api/tests']({}),
+        'forecast_next_month': api._records(next_month.drop(columns='kind')),
+        'power': {
+            **power,
+            'required_sample_sizes': api._records(
+                # Los tamaños no alcanzados (NA) quedan como null en el JSON
+                required_sample_sizes(curves, power['target_power'], power['months']).astype(object).replace({pd.NA: None})
+            ),
+        },
+        'figures': {name: _figure(fig) for name, fig in figures.items()},
+    }
+
+
+def _table(records, columns):
+    frame = pd.DataFrame(records)[list(columns)].rename(columns=columns)
+    return frame.to_html(index=False, na_rep='—', float_format=lambda v: f'{v:,.2f}', border=0, classes='table')
+
+
+def _test_text(name, test):
+    verdict = "Se rechaza H₀" if test['reject_null'] else "No se rechaza H₀"
+    return (
+        f"<p><strong>{html.escape(name)}:</strong> medias ${test['mean_a']:.2f} vs ${test['mean_b']:.2f}, "
+        f"t = {test['t_stat']:.4f}, p = {test['p_value']:.4f} (α = {test['alpha']}). {verdict}.</p>"
+    )
+
+
+def render_html(report):
+    """Página HTML autocontenida: plotly.js en línea y cada figura con su JSON embebido."""
+    kpis = report['kpis']
+    cards = [
+        ("Total de Usuarios", f"{kpis['total_users']:,}"),
+        ("Tasa de Abandono", f"{kpis['churn_rate']:.1f}%"),
+        ("Ingreso Mensual Promedio", f"${kpis['avg_monthly_income']:.2f}"),
+        ("Ingreso Mensual Total Promedio", f"${kpis['avg_total_monthly_income']:,.2f}"),
+    ]
+
+    def figure(name):
+        data = json.dumps(report['figures'][name], ensure_ascii=False).replace('</', '<\\/')
+        return (
+            f"<div id='fig-{name}' class='figure'></div>"
+            f"<script>(function(f){{Plotly.newPlot('fig-{name}', f.data, f.layout, {{responsive: true}});}})({data});</script>"
+        )
+
+    sections = [
+        ("Visión General", [
+            "<div class='kpis'>" + "".join(
+                f"<div class='kpi'><div class='label'>{label}</div><div class='value'>{value}</div></div>"
+                for label, value in cards
+            ) + "</div>",
+            figure('plan_distribution'), figure('city_distribution'),
+            _table(report['plans'], {
+                'plan_name': 'Plan', 'usd_monthly_pay': 'Pago Mensual (USD)', 'minutes_included': 'Minutos Incluidos',
+                'messages_included': 'Mensajes Incluidos', 'mb_per_month_included': 'MB Incluidos',
+                'usd_per_minute': 'Costo por Minuto Extra (USD)', 'usd_per_message': 'Costo por Mensaje Extra (USD)',
+                'usd_per_gb': 'Costo por GB Extra (USD)',
+            }),
+        ]),
+        ("Uso por Plan", [figure('calls'), figure('messages'), figure('internet')]),
+        ("Ingresos", [
+            figure('income_by_month'), figure('income_distribution'),
+            _table(report['revenue_by_plan'], {
+                'plan_name': 'Plan', 'avg_income': 'Ingreso Promedio', 'base_fee': 'Tarifa Base',
+                'extra_minutes': 'Minutos Extra', 'extra_messages': 'Mensajes Extra', 'extra_data': 'Datos Extra',
+                'total_income': 'Ingreso Total',
+            }),
+            "<h3>Pronóstico del Próximo Mes</h3>",
+            _table(report['forecast_next_month'], {
+                'metric': 'Métrica', 'plan_name': 'Plan', 'city': 'Ciudad', 'month': 'Mes',
+                'value': 'Pronóstico ($)', 'lower': 'Límite Inferior ($)', 'upper': 'Límite Superior ($)',
+            }),
+        ]),
+        ("Pruebas Estadísticas", [
+            _test_text("Ingresos Ultimate vs Surf", report['tests']['plan']),
+            _test_text("Ingresos NY-NJ vs otras regiones", report['tests']['region']),
+            f"<h3>Análisis de Potencia (plan {report['power']['plan_name'].capitalize()}, "
+            f"{report['power']['months']} meses, potencia objetivo {report['power']['target_power']})</h3>",
+            figure('power_curves'),
+            _table(report['power']['required_sample_sizes'], {
+                'effect': 'Diferencia (USD)', 'sample_size': 'Suscriptores por grupo', 'user_months': 'Usuarios-mes totales',
+            }),
+        ]),
+    ]
+    body = "".join(
+        f"<h2>{title}</h2>" + "".join(parts) for title, parts in sections
+    )
+    return f"""<!DOCTYPE html>
+<html lang="es">
+<head>
+<meta charset="utf-8">
+<title>Análisis de Planes de Telefonía Megaline</title>
+<style>
+body {{ font-family: sans-serif; max-width: 1200px; margin: 0 auto; padding: 1rem; }}
+h1 {{ color: #1E88E5; text-align: center; }}
+h2 {{ color: #1976D2; margin-top: 2rem; }}
+h3 {{ color: #0D47A1; }}
+.kpis {{ display: flex; gap: 1rem; }}
+.kpi {{ flex: 1; background: #E3F2FD; padding: 1rem; border-radius: 0.5rem; }}
+.kpi .value {{ font-size: 1.8rem; }}
+.table {{ border-collapse: collapse; margin: 1rem 0; }}
+.table th, .table td {{ padding: 0.3rem 0.8rem; text-align: right; border-bottom: 1px solid #ddd; }}
+.figure {{ height: 450px; }}
+</style>
+<script>{get_plotlyjs()}</script>
+</head>
+<body>
+<h1>Análisis de Planes de Telefonía Megaline</h1>
+<p>Versión de datos <code>{html.escape(report['version'])}</code>, generado {html.escape(report['built_at'])}.
+El simulador de escenarios y las vistas filtradas están en el dashboard interactivo.</p>
+{body}
+</body>
+</html>
+"""
+
+
+def build_report(report_dir=REPORT_DIR, force=False):
+    """Escribe ``index.html`` y ``report.json`` si cambió la versión del conjunto de datos.
+
+    Compara la versión de ``load_state`` con ``_VERSION`` del reporte y, si
+    coinciden (y no hay ``force``), no hace nada. El reporte se escribe en un
+    directorio temporal que luego reemplaza al anterior, así que un servidor
+    nunca entrega un reporte a medio escribir. Devuelve ``(versión, reconstruido)``.
+    """
+    report_dir = Path(report_dir)
+    version = datasets.load_state().version
+    if not force and stored_version(report_dir) == version:
+        return version, False
+
+    report = compute_report()
+    staging = report_dir.with_name(report_dir.name + '.tmp')
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    (staging / 'report.json').write_text(
+        json.dumps(report, default=api._to_builtin, ensure_ascii=False), encoding='utf-8'
+    )
+    (staging / 'index.html').write_text(render_html(report), encoding='utf-8')
+    (staging / VERSION_FILE).write_text(version)
+
+    previous = report_dir.with_name(report_dir.name + '.old')
+    shutil.rmtree(previous, ignore_errors=True)
+    if report_dir.exists():
+        report_dir.rename(previous)
+    staging.rename(report_dir)
+    shutil.rmtree(previous, ignore_errors=True)
+    return version, True
+
+
+class ReportHandler(SimpleHTTPRequestHandler):
+    # Sólo archivos ya generados: ningún cálculo de Python por solicitud
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(report_dir=REPORT_DIR, host='127.0.0.1', port=8503):
+    return ThreadingHTTPServer((host, port), partial(ReportHandler, directory=str(report_dir)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reporte estático con las vistas por defecto del dashboard Megaline")
+    parser.add_argument('command', choices=['build', 'serve'])
+    parser.add_argument('--out', type=Path, default=REPORT_DIR)
+    parser.add_argument('--force', action='store_true', help="reconstruir aunque la versión no haya cambiado")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8503)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    version, rebuilt = build_report(args.out, force=args.force)
+    status = "generado" if rebuilt else "sin cambios"
+    print(f"Reporte {status} (versión {version}) en {args.out} [{time.perf_counter() - start:.1f} s]")
+
+    if args.command == 'serve':
+        server = make_server(args.out, args.host, args.port)
+        print(f"Reporte estático en http://{args.host}:{args.port}/")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+
+if __name__ == '__main__':
+    main()
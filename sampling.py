@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from billing import MONEY_COLUMNS, to_dollars
+
+# Estratos por defecto: plan × ciudad
+STRATA = ['plan', 'city']
+
+
+def stratified_reservoir_sample(users, per_stratum, strata=STRATA, chunk_size=100_000, seed=42):
+    """Muestra estratificada de usuarios en una sola pasada por bloques.
+
+    Cada usuario recibe una prioridad aleatoria y cada estrato conserva los
+    ``per_stratum`` usuarios de menor prioridad vistos hasta el momento, lo
+    que equivale a un reservorio uniforme por estrato. Devuelve la muestra y
+    el tamaño poblacional de cada estrato, contado en la misma pasada.
+    """
+    rng = np.random.default_rng(seed)
+    reservoir = None
+    stratum_sizes = None
+
+    for start in range(0, len(users), chunk_size):
+        chunk = users.iloc[start:start + chunk_size]
+        chunk = chunk.assign(_priority=rng.random(len(chunk)))
+
+        chunk_sizes = chunk.groupby(strata).size()
+        stratum_sizes = chunk_sizes if stratum_sizes is None else stratum_sizes.add(chunk_sizes, fill_value=0)
+
+        pool = chunk if reservoir is None else pd.concat([reservoir, chunk])
+        reservoir = pool.sort_values('_priority').groupby(strata, sort=False).head(per_stratum)
+
+    if reservoir is None:
+        return users.iloc[:0], pd.Series(dtype=np.int64)
+
+    sample = reservoir.drop(columns='_priority').sort_values('user_id').reset_index(drop=True)
+    return sample, stratum_sizes.astype(np.int64).rename('population')
+
+
+def stratum_weights(sample_users, stratum_sizes, strata=STRATA):
+    """Factor de expansión N_h / n_h de cada usuario muestreado (``user_id`` -> peso)."""
+    sample_sizes = sample_users.groupby(strata).size()
+    weights = (stratum_sizes.reindex(sample_sizes.index) / sample_sizes).rename('weight')
+    keys = pd.MultiIndex.from_frame(sample_users[strata])
+    return pd.Series(weights.reindex(keys).to_numpy(dtype=float), index=sample_users['user_id'], name='weight')
+
+
+def sample_summary(summary_with_plans, sample_users):
+    """Filas de summary_with_plans que pertenecen a los usuarios muestreados."""
+    return summary_with_plans[summary_with_plans['user_id'].isin(sample_users['user_id'])].reset_index(drop=True)
+
+
+def _z(confidence):
+    return stats.norm.ppf(0.5 + confidence / 2)
+
+
+def _stratified_estimate(unit_values, unit_strata, stratum_sizes, unit_weights=None):
+    """Total de Horvitz-Thompson estratificado de un valor por usuario y su varianza."""
+    frame = pd.DataFrame({'value': unit_values}, index=pd.MultiIndex.from_frame(unit_strata))
+    grouped = frame.groupby(level=list(range(unit_strata.shape[1])))['value']
+    per_stratum = pd.DataFrame({
+        'n': grouped.size(),
+        'sum': grouped.sum(),
+        'var': grouped.var(ddof=1).fillna(0),
+    })
+    per_stratum['N'] = stratum_sizes.reindex(per_stratum.index).to_numpy()
+
+    total = (per_stratum['N'] / per_stratum['n'] * per_stratum['sum']).sum()
+    fpc = 1 - per_stratum['n'] / per_stratum['N']
+    variance = (per_stratum['N'] ** 2 * fpc * per_stratum['var'] / per_stratum['n']).sum()
+    return total, variance
+
+
+def _unit_frame(sample_summary_rows, sample_users, value_col, by):
+    # Suma y número de filas por usuario (y por dominio si se indica ``by``)
+    # Las columnas de dinero (centavos) se estiman en dólares
+    keys = ['user_id'] if by is None else ['user_id', by]
+    values = sample_summary_rows[value_col]
+    if value_col in MONEY_COLUMNS:
+        values = to_dollars(values)
+    per_unit = values.groupby([sample_summary_rows[k] for k in keys]).agg(['sum', 'count']).reset_index()
+    return sample_users.merge(per_unit, on='user_id', how='left')
+
+
+def stratified_mean_ci(sample_summary_rows, sample_users, stratum_sizes, value_col='total_monthly_cost',
+                       by=None, strata=STRATA, confidence=0.95):
+    """Media por fila usuario-mes con intervalo de confianza, estimada como razón estratificada.
+
+    Con ``by`` se estima una media por dominio (p. ej. ``'plan_name'``). Devuelve
+    un DataFrame con ``estimate``, ``lower``, ``upper`` y ``half_width``.
+    """
+    units = _unit_frame(sample_summary_rows, sample_users, value_col, by)
+    domains = [None] if by is None else sorted(units[by].dropna().unique())
+    z = _z(confidence)
+
+    rows = []
+    for domain in domains:
+        in_domain = units[by] == domain if by is not None else pd.Series(True, index=units.index)
+        # Cada usuario muestreado cuenta en su estrato; fuera del dominio aporta cero
+        per_user = units.assign(
+            y=units['sum'].where(in_domain, 0).fillna(0),
+            m=units['count'].where(in_domain, 0).fillna(0),
+        ).groupby('user_id').agg({**{s: 'first' for s in strata}, 'y': 'sum', 'm': 'sum'})
+
+        y_total, _ = _stratified_estimate(per_user['y'].to_numpy(), per_user[strata], stratum_sizes)
+        m_total, _ = _stratified_estimate(per_user['m'].to_numpy(), per_user[strata], stratum_sizes)
+        ratio = y_total / m_total if m_total else np.nan
+
+        # Linealización de la razón para la varianza
+        residual = (per_user['y'] - ratio * per_user['m']) / m_total if m_total else per_user['y'] * 0
+        _, variance = _stratified_estimate(residual.to_numpy(), per_user[strata], stratum_sizes)
+        half_width = z * np.sqrt(variance)
+
+        rows.append({
+            **({} if by is None else {by: domain}),
+            'estimate': ratio,
+            'lower': ratio - half_width,
+            'upper': ratio + half_width,
+            'half_width': half_width,
+        })
+
+    return pd.DataFrame(rows)
+
+
+def stratified_proportion_ci(sample_users, stratum_sizes, mask, strata=STRATA, confidence=0.95):
+    """Proporción poblacional de usuarios que cumplen ``mask``, con su intervalo de confianza."""
+    indicator = np.asarray(mask, dtype=float)
+    total, variance = _stratified_estimate(indicator, sample_users[strata], stratum_sizes)
+    population = stratum_sizes.sum()
+    estimate = total / population
+    half_width = _z(confidence) * np.sqrt(variance) / population
+    return {'estimate': estimate, 'lower': estimate - half_width, 'upper': estimate + half_width,
+            'half_width': half_width}
+
+
+def stratified_monthly_total_ci(sample_summary_rows, sample_users, stratum_sizes,
+                                value_col='total_monthly_cost', strata=STRATA, confidence=0.95):
+    """Total mensual promedio de ``value_col`` en la población, con su intervalo de confianza."""
+    n_months = sample_summary_rows['month'].nunique()
+    units = _unit_frame(sample_summary_rows, sample_users, value_col, None)
+    total, variance = _stratified_estimate(units['sum'].fillna(0).to_numpy(), units[strata], stratum_sizes)
+    estimate = total / n_months if n_months else np.nan
+    half_width = _z(confidence) * np.sqrt(variance) / n_months if n_months else np.nan
+    return {'estimate': estimate, 'lower': estimate - half_width, 'upper': estimate + half_width,
+            'half_width': half_width}
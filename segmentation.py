@@ -0,0 +1,138 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from billing import to_dollars
+
+# Variables del perfil de uso por suscriptor
+PROFILE_FEATURES = ['mean_minutes', 'mean_messages', 'mean_gb', 'overage_rate', 'mean_revenue']
+
+
+def user_usage_profiles(subscriber_index):
+    """Perfil de uso promedio por usuario a partir del índice de suscriptores.
+
+    Las filas de cada usuario son contiguas, así que las medias se obtienen con
+    ``np.add.reduceat`` sobre los desplazamientos del índice.
+    """
+    table = subscriber_index.table
+    counts = np.diff(subscriber_index.offsets)
+    has_rows = counts > 0
+    starts = subscriber_index.offsets[:-1][has_rows]
+    n_months = counts[has_rows]
+
+    overage = (
+        (table['extra_minutes'].to_numpy() > 0)
+        | (table['extra_messages'].to_numpy() > 0)
+        | (table['extra_mb'].to_numpy() > 0)
+    ).astype(float)
+    values = np.column_stack([
+        table['total_minutes'].to_numpy(dtype=float),
+        table['messages_count'].to_numpy(dtype=float),
+        table['usage_mb'].to_numpy(dtype=float) / 1024,
+        overage,
+        to_dollars(table['total_monthly_cost'].to_numpy(dtype=float)),
+    ])
+    means = np.add.reduceat(values, starts, axis=0) / n_months[:, None] if len(starts) else values[:0]
+
+    profiles = pd.DataFrame(means, columns=PROFILE_FEATURES)
+    profiles.insert(0, 'user_id', np.flatnonzero(has_rows) + subscriber_index.first_id)
+    profiles.insert(1, 'plan_name', table['plan_name'].to_numpy()[starts])
+    profiles['months'] = n_months
+    return profiles
+
+
+def _nearest(points, centers):
+    # Distancia euclidiana al cuadrado sin el término constante ||x||²
+    scores = points @ centers.T * -2 + (centers ** 2).sum(axis=1)
+    return scores.argmin(axis=1)
+
+
+def _kmeans_plus_plus(points, k, rng):
+    centers = [points[rng.integers(len(points))]]
+    for _ in range(1, k):
+        distances = ((points[:, None, :] - np.array(centers)[None]) ** 2).sum(axis=2).min(axis=1)
+        total = distances.sum()
+        probabilities = distances / total if total > 0 else None
+        centers.append(points[rng.choice(len(points), p=probabilities)])
+    return np.array(centers)
+
+
+def _initial_centers(sample, k, n_init, rng, iterations=10):
+    # Varias inicializaciones k-means++ refinadas con Lloyd sobre la muestra; gana la de menor inercia
+    best_centers, best_inertia = None, np.inf
+    for _ in range(n_init):
+        centers = _kmeans_plus_plus(sample, k, rng)
+        for _ in range(iterations):
+            labels = _nearest(sample, centers)
+            counts = np.bincount(labels, minlength=k)
+            sums = np.zeros_like(centers)
+            np.add.at(sums, labels, sample)
+            filled = counts > 0
+            centers[filled] = sums[filled] / counts[filled, None]
+        inertia = ((sample - centers[_nearest(sample, centers)]) ** 2).sum()
+        if inertia < best_inertia:
+            best_centers, best_inertia = centers, inertia
+    return best_centers
+
+
+def minibatch_kmeans(points, k, batch_size=4096, epochs=5, init_size=20_000, n_init=5, seed=42):
+    """K-means por mini-lotes: recorre los puntos por bloques y mueve cada centro hacia la media del lote.
+
+    La tasa de aprendizaje de cada centro es 1 / (puntos vistos por ese centro),
+    por lo que cada bloque se procesa en forma vectorizada y la memoria no
+    depende del número total de usuarios.
+    """
+    rng = np.random.default_rng(seed)
+    init_sample = points[rng.choice(len(points), size=min(init_size, len(points)), replace=False)]
+    centers = _initial_centers(init_sample, k, n_init, rng)
+    seen = np.zeros(k)
+
+    for _ in range(epochs):
+        order = rng.permutation(len(points))
+        for start in range(0, len(points), batch_size):
+            batch = points[order[start:start + batch_size]]
+            labels = _nearest(batch, centers)
+            batch_counts = np.bincount(labels, minlength=k)
+            batch_sums = np.zeros_like(centers)
+            np.add.at(batch_sums, labels, batch)
+
+            updated = batch_counts > 0
+            seen[updated] += batch_counts[updated]
+            centers[updated] += (batch_sums[updated] - batch_counts[updated, None] * centers[updated]) / seen[updated, None]
+
+    return centers
+
+
+def assign_segments(points, centers, chunk_size=100_000, n_jobs=None):
+    """Asigna cada punto a su centro más cercano, repartiendo los bloques entre varios hilos."""
+    n_jobs = n_jobs or os.cpu_count() or 1
+    chunks = [points[start:start + chunk_size] for start in range(0, len(points), chunk_size)]
+    if not chunks:
+        return np.empty(0, dtype=np.int64)
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        return np.concatenate(list(pool.map(lambda chunk: _nearest(chunk, centers), chunks)))
+
+
+def segment_users(profiles, k=4, features=PROFILE_FEATURES, seed=42, n_jobs=None):
+    """Segmenta usuarios por su perfil de uso estandarizado.
+
+    Devuelve los perfiles con la columna ``segment`` y los centroides en las
+    unidades originales, ordenados por ingreso promedio.
+    """
+    values = profiles[features].to_numpy(dtype=float)
+    mean, std = values.mean(axis=0), values.std(axis=0)
+    std[std == 0] = 1
+    points = (values - mean) / std
+
+    centers = minibatch_kmeans(points, k, seed=seed)
+    labels = assign_segments(points, centers, n_jobs=n_jobs)
+
+    # Numerar los segmentos de menor a mayor ingreso promedio
+    centroids = pd.DataFrame(centers * std + mean, columns=features)
+    rank = centroids['mean_revenue'].rank(method='first').astype(int).to_numpy() - 1
+    centroids.index = rank
+    centroids = centroids.sort_index().rename_axis('segment')
+
+    return profiles.assign(segment=rank[labels]), centroids
@@ -0,0 +1,132 @@
+import gc
+import tracemalloc
+from dataclasses import fields, replace
+
+import numpy as np
+import pandas as pd
+
+
+class _ReadOnly:
+    # Bloquea las escrituras que no pasan por los arreglos (ya marcados como sólo lectura):
+    # pandas aplica todas las operaciones con ``inplace=True`` mediante ``_update_inplace``
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("Dato compartido de sólo lectura: usar .copy() antes de modificarlo")
+
+    __setitem__ = __delitem__ = pop = update = _update_inplace = _read_only
+
+    def __setattr__(self, name, value):
+        # ``_mgr`` es el que reemplazan las ampliaciones con ``loc`` (filas nuevas)
+        if name in ('index', 'columns', '_mgr'):
+            self._read_only()
+        super().__setattr__(name, value)
+
+    def _set_axis_name(self, name, axis=0, inplace=False):
+        if inplace:
+            self._read_only()
+        return super()._set_axis_name(name, axis=axis, inplace=inplace)
+
+
+class FrozenFrame(_ReadOnly, pd.DataFrame):
+    """DataFrame compartido de sólo lectura.
+
+    No admite agregar, reemplazar ni quitar columnas, reasignar ``index`` o
+    ``columns``, ni operaciones con ``inplace=True`` (``drop``, ``rename``,
+    ``sort_values``, ``dropna``…): todas lanzan ``TypeError``. Las operaciones
+    que devuelven un DataFrame nuevo (filtros, ``assign``, ``copy``,
+    ``groupby``…) devuelven un ``pd.DataFrame`` normal, así que para modificar
+    los datos basta con trabajar sobre una copia.
+    """
+
+    insert = _ReadOnly._read_only
+
+    @property
+    def _constructor(self):
+        return pd.DataFrame
+
+
+class FrozenSeries(_ReadOnly, pd.Series):
+    """Series compartida de sólo lectura, con las mismas reglas que ``FrozenFrame``."""
+
+    def _set_name(self, name, inplace=False, deep=None):
+        if inplace:
+            self._read_only()
+        return super()._set_name(name, inplace=inplace, deep=deep)
+
+    @property
+    def _constructor(self):
+        return pd.Series
+
+    @property
+    def _constructor_expanddim(self):
+        return pd.DataFrame
+
+
+def _read_only_values(column):
+    # Arreglo NumPy propio con ``writeable=False``; las columnas de extensión (texto,
+    # períodos) ya son inmutables o se conservan tal cual
+    if isinstance(column.dtype, np.dtype):
+        values = column.to_numpy(copy=True)
+        values.flags.writeable = False
+        return values
+    return column.array
+
+
+def freeze_frame(frame):
+    """Devuelve un ``FrozenFrame`` cuyos arreglos NumPy tienen ``writeable=False``.
+
+    Cualquier escritura en el lugar (``loc``, ``iloc``, ``.values[...]``) lanza
+    ``ValueError``; asignar o quitar columnas y las operaciones con
+    ``inplace=True`` lanzan ``TypeError``.
+    """
+    columns = {name: _read_only_values(frame[name]) for name in frame.columns}
+    return FrozenFrame(columns, index=frame.index, copy=False)
+
+
+def freeze(value):
+    """Congela DataFrames, Series y arreglos sueltos, o tuplas, dicts y dataclasses que los contienen."""
+    if isinstance(value, (FrozenFrame, FrozenSeries)):
+        return value
+    if isinstance(value, pd.DataFrame):
+        return freeze_frame(value)
+    if isinstance(value, pd.Series):
+        return FrozenSeries(_read_only_values(value), index=value.index, name=value.name, copy=False)
+    if isinstance(value, np.ndarray):
+        view = value.view()
+        view.flags.writeable = False
+        return view
+    if isinstance(value, tuple):
+        return tuple(freeze(v) for v in value)
+    if isinstance(value, dict):
+        return {k: freeze(v) for k, v in value.items()}
+    if hasattr(value, '__dataclass_fields__'):
+        return replace(value, **{f.name: freeze(getattr(value, f.name)) for f in fields(value)})
+    return value
+
+
+def measure_session_memory(load, sessions=(1, 10, 50), warmup=1):
+    """Memoria asignada por sesión cuando ``sessions`` sesiones llaman a ``load``.
+
+    Cada sesión conserva una referencia a lo que devuelve ``load`` (como hace
+    un rerun de Streamlit). Las ``warmup`` llamadas previas llenan las cachés
+    y no se miden, así que el valor es lo que agrega cada sesión: con un
+    recurso compartido es pequeño y no depende del número de sesiones; con
+    copias por sesión crece con el tamaño de los datos.
+    """
+    for _ in range(warmup):
+        load()  # calentar las cachés antes de medir
+    results = []
+    for n in sessions:
+        gc.collect()
+        tracemalloc.start()
+        held = [load() for _ in range(n)]
+        gc.collect()  # sólo cuenta lo que las sesiones retienen, no la basura cíclica pendiente
+        allocated, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results.append({
+            'sessions': n,
+            'allocated_bytes': allocated,
+            'bytes_per_session': allocated / n,
+        })
+        del held
+    return pd.DataFrame(results)
@@ -0,0 +1,134 @@
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+# Carpeta con los CSV originales de Megaline (la misma que usa el notebook)
+SOURCE_DIR = Path(os.environ.get('MEGALINE_SOURCE_DIR', '/datasets'))
+
+# Las fechas vienen como AAAA-MM-DD; se convierten al leer, sin inferencia
+DATE_FORMAT = '%Y-%m-%d'
+
+_DATE = pa.timestamp('s')
+_CATEGORY = pa.dictionary(pa.int32(), pa.string())
+
+# Esquema explícito de cada tabla: archivo y tipo de cada columna
+SOURCE_TABLES = {
+    'calls': {
+        'file': 'megaline_calls.csv',
+        'columns': {'id': pa.string(), 'user_id': pa.int64(), 'call_date': _DATE, 'duration': pa.float64()},
+    },
+    'internet': {
+        'file': 'megaline_internet.csv',
+        'columns': {'id': pa.string(), 'user_id': pa.int64(), 'session_date': _DATE, 'mb_used': pa.float64()},
+    },
+    'messages': {
+        'file': 'megaline_messages.csv',
+        'columns': {'id': pa.string(), 'user_id': pa.int64(), 'message_date': _DATE},
+    },
+    'plans': {
+        'file': 'megaline_plans.csv',
+        'columns': {
+            'messages_included': pa.int64(), 'mb_per_month_included': pa.int64(),
+            'minutes_included': pa.int64(), 'usd_monthly_pay': pa.float64(),
+            'usd_per_gb': pa.float64(), 'usd_per_message': pa.float64(),
+            'usd_per_minute': pa.float64(), 'plan_name': pa.string(),
+        },
+    },
+    'users': {
+        'file': 'megaline_users.csv',
+        'columns': {
+            'user_id': pa.int64(), 'first_name': pa.string(), 'last_name': pa.string(),
+            'age': pa.int16(), 'city': _CATEGORY, 'reg_date': _DATE, 'plan': _CATEGORY,
+            'churn_date': _DATE,
+        },
+    },
+}
+
+
+# Historial de cambios de plan (opcional): un intervalo [valid_from, valid_to) por fila
+PLAN_HISTORY_TABLES = {
+    'plan_history': {
+        'file': 'megaline_plan_history.csv',
+        'columns': {'user_id': pa.int64(), 'plan': pa.string(), 'valid_from': _DATE, 'valid_to': _DATE},
+    },
+}
+
+
+def read_table(name, source_dir=SOURCE_DIR, tables=SOURCE_TABLES):
+    """Lee una tabla con el lector CSV columnar y multihilo de pyarrow.
+
+    Los tipos de columna son explícitos y las fechas se convierten durante la
+    lectura con ``DATE_FORMAT``. Devuelve el DataFrame y las métricas de lectura
+    (bytes, filas, segundos y rendimiento).
+    """
+    spec = tables[name]
+    path = Path(source_dir) / spec['file']
+    start = time.perf_counter()
+    table = pa_csv.read_csv(
+        path,
+        read_options=pa_csv.ReadOptions(use_threads=True),
+        convert_options=pa_csv.ConvertOptions(
+            column_types=spec['columns'],
+            include_columns=list(spec['columns']),
+            timestamp_parsers=[DATE_FORMAT],
+        ),
+    )
+    frame = table.to_pandas()
+    seconds = time.perf_counter() - start
+
+    size = path.stat().st_size
+    return frame, {
+        'table': name,
+        'file': spec['file'],
+        'bytes': size,
+        'rows': len(frame),
+        'seconds': seconds,
+        'mb_per_second': size / 2 ** 20 / seconds if seconds > 0 else float('inf'),
+        'rows_per_second': len(frame) / seconds if seconds > 0 else float('inf'),
+    }
+
+
+def load_sources(source_dir=SOURCE_DIR, tables=SOURCE_TABLES, max_workers=None):
+    """Lee todas las tablas a la vez, una por hilo.
+
+    El lector de pyarrow libera el GIL, así que el tiempo total queda acotado
+    por el archivo más grande y no por la suma. Devuelve ``{nombre: DataFrame}``
+    y un reporte con una fila por archivo más la fila ``total`` (tiempo de pared).
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers or len(tables)) as pool:
+        results = dict(zip(tables, pool.map(lambda name: read_table(name, source_dir, tables), tables)))
+    wall_seconds = time.perf_counter() - start
+
+    report = pd.DataFrame([stats for _, stats in results.values()])
+    total_bytes, total_rows = report['bytes'].sum(), report['rows'].sum()
+    report.loc[len(report)] = {
+        'table': 'total',
+        'file': '',
+        'bytes': total_bytes,
+        'rows': total_rows,
+        'seconds': wall_seconds,
+        'mb_per_second': total_bytes / 2 ** 20 / wall_seconds,
+        'rows_per_second': total_rows / wall_seconds,
+    }
+    return {name: frame for name, (frame, _) in results.items()}, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lee los CSV de Megaline en paralelo y reporta el rendimiento por archivo")
+    parser.add_argument('source_dir', nargs='?', default=str(SOURCE_DIR))
+    args = parser.parse_args()
+
+    _, report = load_sources(args.source_dir)
+    with pd.option_context('display.float_format', '{:,.2f}'.format, 'display.width', 120):
+        print(report.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+import shutil
+from pathlib import Path
+
+import pandas as pd
+
+from billing import SUMMARY_COLUMNS
+
+# Directorio por defecto de la tabla de hechos particionada
+STORE_DIR = Path(__file__).resolve().parent / 'data' / 'summary_with_plans'
+
+PART_FILE = 'part-0.parquet'
+VERSION_FILE = '_VERSION'
+
+
+def _partition_dir(root, month, plan_name=None):
+    path = Path(root) / f'month={month}'
+    return path if plan_name is None else path / f'plan_name={plan_name}'
+
+
+def write_partition(root, month_rows, by_plan=False):
+    """Escribe las filas de un mes en ``month=YYYY-MM`` (y ``plan_name=...`` si ``by_plan``).
+
+    Las columnas de partición no se guardan dentro del archivo: su valor está
+    en el nombre del directorio.
+    """
+    month = month_rows['month'].iloc[0]
+    groups = month_rows.groupby('plan_name') if by_plan else [(None, month_rows)]
+    for plan_name, rows in groups:
+        path = _partition_dir(root, month, plan_name)
+        path.mkdir(parents=True, exist_ok=True)
+        partition_cols = ['month'] + (['plan_name'] if by_plan else [])
+        rows.drop(columns=partition_cols).to_parquet(path / PART_FILE, index=False)
+
+
+def write_month_partitions(month_frames, root=STORE_DIR, by_plan=False, version=None):
+    """Escribe un directorio por cada DataFrame mensual, reemplazando las particiones previas.
+
+    Recibe las filas ya separadas por mes, así que no hace falta armar la
+    tabla completa en memoria para escribirla.
+    """
+    root = Path(root)
+    for stale in root.glob('month=*'):
+        shutil.rmtree(stale)
+    for month_rows in month_frames:
+        write_partition(root, month_rows, by_plan=by_plan)
+    if version is not None:
+        (root / VERSION_FILE).write_text(version)
+
+
+def write_partitioned(summary_with_plans, root=STORE_DIR, by_plan=False, version=None):
+    """Escribe la tabla completa, un directorio por mes, reemplazando las particiones previas."""
+    month_frames = (month_rows for _, month_rows in summary_with_plans.groupby('month', sort=True))
+    write_month_partitions(month_frames, root, by_plan=by_plan, version=version)
+
+
+def sync_month_partitions(partitions, month_versions, root=STORE_DIR, by_plan=False):
+    """Deja en disco exactamente los meses de ``partitions``, reescribiendo sólo los que cambiaron.
+
+    Cada directorio ``month=...`` guarda en ``_VERSION`` la huella de su mes
+    (``AggregateState.month_versions``). Un mes se reescribe sólo si su huella
+    no coincide, y se borran sólo los directorios de meses que ya no existen;
+    así un refresco mensual escribe un mes y no la historia. La huella se
+    escribe al final, de modo que una escritura interrumpida se repite.
+    Devuelve los meses escritos.
+    """
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    for month_dir in root.glob('month=*'):
+        if pd.Period(month_dir.name.split('=', 1)[1], freq='M') not in partitions:
+            shutil.rmtree(month_dir)
+
+    written = []
+    for month, month_rows in partitions.items():
+        path = _partition_dir(root, month)
+        if stored_version(path) == month_versions[month]:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        write_partition(root, month_rows, by_plan=by_plan)
+        (path / VERSION_FILE).write_text(month_versions[month])
+        written.append(month)
+    return written
+
+
+def stored_version(root=STORE_DIR):
+    path = Path(root) / VERSION_FILE
+    return path.read_text().strip() if path.exists() else None
+
+
+def list_partitions(root=STORE_DIR):
+    """Inventario de particiones (``month``, ``plan_name``, ``path``) sin abrir ningún archivo."""
+    rows = []
+    for month_dir in sorted(Path(root).glob('month=*')):
+        month = pd.Period(month_dir.name.split('=', 1)[1], freq='M')
+        plan_dirs = sorted(month_dir.glob('plan_name=*'))
+        if plan_dirs:
+            rows.extend((month, d.name.split('=', 1)[1], d / PART_FILE) for d in plan_dirs)
+        elif (month_dir / PART_FILE).exists():
+            rows.append((month, None, month_dir / PART_FILE))
+    return pd.DataFrame(rows, columns=['month', 'plan_name', 'path'])
+
+
+def read_partitioned(root=STORE_DIR, start=None, end=None, plans=None, columns=None):
+    """Lee sólo las particiones dentro de [``start``, ``end``] y, opcionalmente, de ``plans``.
+
+    ``columns`` limita las columnas que se leen de cada archivo; ``month`` y
+    ``plan_name`` se reconstruyen a partir del nombre del directorio cuando
+    son columnas de partición.
+    """
+    partitions = list_partitions(root)
+    if start is not None:
+        partitions = partitions[partitions['month'] >= pd.Period(start, freq='M')]
+    if end is not None:
+        partitions = partitions[partitions['month'] <= pd.Period(end, freq='M')]
+    if plans is not None:
+        # Si la tabla no está particionada por plan, el filtro se aplica tras leer
+        partitions = partitions[partitions['plan_name'].isna() | partitions['plan_name'].isin(plans)]
+
+    frames = []
+    for month, plan_name, path in partitions.itertuples(index=False):
+        partition_values = {'month': month}
+        if plan_name is not None and pd.notna(plan_name):
+            partition_values['plan_name'] = plan_name
+        filter_rows = plans is not None and 'plan_name' not in partition_values
+        file_columns = None if columns is None else [c for c in columns if c not in partition_values]
+        if file_columns is not None and filter_rows and 'plan_name' not in file_columns:
+            file_columns.append('plan_name')
+        frame = pd.read_parquet(path, columns=file_columns)
+        for name, value in partition_values.items():
+            if columns is None or name in columns:
+                frame[name] = value
+        if filter_rows:
+            frame = frame[frame['plan_name'].isin(plans)]
+        frames.append(frame)
+
+    if not frames:
+        return pd.DataFrame(columns=columns if columns is not None else SUMMARY_COLUMNS)
+
+    result = pd.concat(frames, ignore_index=True)
+    if columns is not None:
+        return result[list(columns)]
+    ordered = [c for c in SUMMARY_COLUMNS if c in result] + [c for c in result if c not in SUMMARY_COLUMNS]
+    return result[ordered]
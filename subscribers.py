@@ -0,0 +1,55 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class SubscriberIndex:
+    """Índice user_id -> rango de filas sobre la tabla de hechos ordenada por usuario.
+
+    Las filas de un usuario son contiguas en ``table``; ``offsets`` guarda su
+    inicio y fin en un arreglo denso indexado por ``user_id - first_id``, así
+    que la búsqueda es de tiempo constante sin importar el tamaño de la tabla.
+    """
+
+    table: pd.DataFrame
+    first_id: int
+    offsets: np.ndarray
+
+    def _slot(self, user_id):
+        slot = int(user_id) - self.first_id
+        if slot < 0 or slot >= len(self.offsets) - 1:
+            return None
+        return slot
+
+    def __contains__(self, user_id):
+        slot = self._slot(user_id)
+        return slot is not None and self.offsets[slot + 1] > self.offsets[slot]
+
+    def row_range(self, user_id):
+        slot = self._slot(user_id)
+        if slot is None:
+            return 0, 0
+        return int(self.offsets[slot]), int(self.offsets[slot + 1])
+
+    def rows(self, user_id):
+        """Filas usuario-mes del suscriptor, en orden de mes."""
+        start, stop = self.row_range(user_id)
+        return self.table.iloc[start:stop]
+
+
+def build_subscriber_index(summary_with_plans):
+    """Ordena la tabla por (user_id, month) una vez y calcula los desplazamientos por usuario."""
+    user_ids = summary_with_plans['user_id'].to_numpy(dtype=np.int64)
+    if len(user_ids) == 0:
+        return SubscriberIndex(summary_with_plans.iloc[:0], 0, np.zeros(1, dtype=np.int64))
+
+    month_ordinals = summary_with_plans['month'].array.asi8
+    order = np.lexsort((month_ordinals, user_ids))
+    table = summary_with_plans.iloc[order].reset_index(drop=True)
+
+    first_id = int(user_ids.min())
+    counts = np.bincount(user_ids[order] - first_id)
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    return SubscriberIndex(table, first_id, offsets)